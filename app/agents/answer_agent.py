@@ -5,11 +5,16 @@ and generates citations for the response.
 """
 
 import logging
-from typing import Tuple
+import re
+from functools import lru_cache
+from typing import Any, AsyncIterator, Tuple
 
 from app.agents.base import BaseAgent
+from app.cache import get_semantic_cache, semantic_cache_embedding
+from app.config import get_settings
 from app.models.schemas import (
     AgentResult,
+    Category,
     Citation,
     IntentClassification,
     SearchResult,
@@ -18,6 +23,9 @@ from app.tools.openai_tool import get_openai_tool
 
 logger = logging.getLogger(__name__)
 
+# Matches numbered source references like [1] or [12] in a generated answer
+_CITE_RE = re.compile(r"\[(\d+)\]")
+
 SYNTHESIS_PROMPT = """You are a helpful city services assistant. Based on the search results provided, answer the user's question.
 
 Guidelines:
@@ -27,6 +35,8 @@ Guidelines:
 4. Keep the response concise but informative
 5. If relevant, suggest next steps or additional resources
 
+Each search result is one line: [number] title | category | content
+
 User Question: {query}
 
 Search Results:
@@ -42,31 +52,43 @@ NO_RESULTS_RESPONSE = """I don't have specific information about that in my know
 
 Is there anything else I can help you with?"""
 
+GREETING_RESPONSE = "Hello! I'm CivicNav, your city services assistant. Ask me about trash pickup, permits, events, reporting issues, and other city services."
+
+SYNTHESIS_ERROR_RESPONSE = "I'm having trouble generating a response right now. Please try again or contact City Hall directly."
+
 
-class AnswerAgent(BaseAgent[Tuple[str, list[SearchResult], IntentClassification], dict]):
+AnswerInput = Tuple[str, list[SearchResult], IntentClassification, list[float] | None]
+
+
+class AnswerAgent(BaseAgent[AnswerInput, dict]):
     """Agent for synthesizing answers with citations.
 
-    Takes a tuple of (query, search_results, intent) and returns a dict
-    containing the answer text and citation list.
+    Takes a tuple of (query, search_results, intent, embedding) and returns
+    a dict containing the answer text and citation list. The query embedding
+    is optional; when provided (or when a local cache embedder is
+    configured), it is used to serve paraphrased repeats from the semantic
+    answer cache without calling the LLM.
     """
 
     def __init__(self) -> None:
         """Initialize the AnswerAgent."""
         super().__init__("AnswerAgent")
         self.openai_tool = get_openai_tool()
+        self.settings = get_settings()
+        self.cache = get_semantic_cache()
 
-    async def run(
-        self, input_data: Tuple[str, list[SearchResult], IntentClassification]
-    ) -> AgentResult:
+    async def run(self, input_data: AnswerInput) -> AgentResult:
         """Synthesize an answer from search results.
 
         Args:
-            input_data: Tuple of (query, search_results, intent)
+            input_data: Tuple of (query, search_results, intent, embedding).
+                The trailing embedding may be omitted or None.
 
         Returns:
             AgentResult containing dict with 'answer' and 'citations'
         """
-        query, search_results, intent = input_data
+        query, search_results, intent, *rest = input_data
+        embedding = rest[0] if rest else None
         logger.info(f"AnswerAgent synthesizing answer for: {query[:50]}...")
 
         # Handle no results case
@@ -81,28 +103,46 @@ class AnswerAgent(BaseAgent[Tuple[str, list[SearchResult], IntentClassification]
                 tools_used=self.tools_used,
             )
 
-        # Format search results for the prompt
-        results_text = self._format_results(search_results)
+        # Only the highest-scoring results are worth spending prompt tokens on
+        search_results = self._top_results(search_results)
+
+        # Return curated FAQ answers verbatim when the top match is near-exact
+        canonical = self._canonical_answer(search_results)
+        if canonical is not None:
+            top = search_results[0]
+            logger.info(f"AnswerAgent returning canonical answer {top.entry_id}")
+            return AgentResult(
+                output=canonical,
+                reasoning=f"Top result '{top.title}' is a canonical FAQ match (score {top.relevance_score:.2f}); skipped synthesis.",
+                tools_used=self.tools_used,
+            )
+
+        # Serve paraphrased repeats from the semantic cache
+        cache_key = await self._cache_embedding(query, embedding)
+        if cache_key is not None:
+            self.use_tool("semantic_cache")
+            hit = self.cache.lookup(cache_key)
+            if hit is not None:
+                cached, similarity = hit
+                logger.info(f"AnswerAgent semantic cache hit (similarity {similarity:.2f})")
+                return AgentResult(
+                    output={
+                        "answer": cached["answer"],
+                        "citations": cached["citations"],
+                    },
+                    reasoning=f"Served cached answer for a similar query (similarity {similarity:.2f}).",
+                    tools_used=self.tools_used,
+                )
 
         # Generate answer using OpenAI
         self.use_tool("openai_chat")
 
-        prompt = SYNTHESIS_PROMPT.format(
-            query=query,
-            results=results_text,
-        )
-
         try:
             answer = await self.openai_tool.chat_completion(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful city services assistant. Provide accurate, helpful answers based on the provided search results.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
+                messages=self._build_messages(query, search_results),
                 temperature=0.7,
-                max_tokens=500,
+                max_tokens=self._max_tokens(search_results),
+                model=self.settings.synthesis_model or None,
             )
 
             # Generate citations from search results
@@ -113,6 +153,9 @@ class AnswerAgent(BaseAgent[Tuple[str, list[SearchResult], IntentClassification]
 
             logger.info(f"AnswerAgent generated {len(answer)} char answer with {len(citations)} citations")
 
+            if cache_key is not None:
+                self.cache.store(cache_key, answer, citations)
+
             return AgentResult(
                 output={
                     "answer": answer,
@@ -127,41 +170,179 @@ class AnswerAgent(BaseAgent[Tuple[str, list[SearchResult], IntentClassification]
             # Return a graceful fallback
             return AgentResult(
                 output={
-                    "answer": "I'm having trouble generating a response right now. Please try again or contact City Hall directly.",
+                    "answer": SYNTHESIS_ERROR_RESPONSE,
                     "citations": [],
                 },
                 reasoning=f"Synthesis failed: {e}",
                 tools_used=self.tools_used,
             )
 
+    async def run_stream(self, input_data: AnswerInput) -> AsyncIterator[dict[str, Any]]:
+        """Synthesize an answer, yielding tokens as they are generated.
+
+        Yields ``{"token": str}`` events while the answer streams, followed
+        by a single ``{"citations": list[Citation]}`` event once generation
+        completes. Citations are derived from the buffered answer text.
+        A synthesis failure before the first token yields the fallback
+        message; after it, the error propagates so the caller can report
+        the answer as incomplete.
+
+        Args:
+            input_data: Tuple of (query, search_results, intent, embedding).
+                The trailing embedding may be omitted or None.
+
+        Yields:
+            Token events followed by a terminal citations event
+        """
+        query, search_results, intent, *rest = input_data
+        embedding = rest[0] if rest else None
+        logger.info(f"AnswerAgent streaming answer for: {query[:50]}...")
+
+        if not search_results:
+            yield {"token": NO_RESULTS_RESPONSE}
+            yield {"citations": []}
+            return
+
+        search_results = self._top_results(search_results)
+        canonical = self._canonical_answer(search_results)
+        if canonical is not None:
+            yield {"token": canonical["answer"]}
+            yield {"citations": canonical["citations"]}
+            return
+
+        cache_key = await self._cache_embedding(query, embedding)
+        if cache_key is not None:
+            hit = self.cache.lookup(cache_key)
+            if hit is not None:
+                cached, similarity = hit
+                logger.info(f"AnswerAgent semantic cache hit (similarity {similarity:.2f})")
+                yield {"token": cached["answer"]}
+                yield {"citations": cached["citations"]}
+                return
+
+        chunks: list[str] = []
+        try:
+            async for token in self.openai_tool.chat_completion_stream(
+                messages=self._build_messages(query, search_results),
+                temperature=0.7,
+                max_tokens=self._max_tokens(search_results),
+                model=self.settings.synthesis_model or None,
+            ):
+                chunks.append(token)
+                yield {"token": token}
+        except Exception as e:
+            logger.error(f"AnswerAgent streaming synthesis failed: {e}")
+            if chunks:
+                # A partial answer must not end like a complete one
+                raise
+            yield {"token": SYNTHESIS_ERROR_RESPONSE}
+            yield {"citations": []}
+            return
+
+        answer = "".join(chunks)
+        citations = self._generate_citations(search_results, answer)
+        logger.info(f"AnswerAgent streamed {len(answer)} char answer with {len(citations)} citations")
+
+        if cache_key is not None:
+            self.cache.store(cache_key, answer, citations)
+
+        yield {"citations": citations}
+
+    async def _cache_embedding(
+        self, query: str, embedding: list[float] | None
+    ) -> list[float] | None:
+        """Get the semantic cache key for a query, or None if caching is off."""
+        if not self.settings.semantic_cache_enabled:
+            return None
+        return await semantic_cache_embedding(query, embedding) or None
+
+    def _top_results(self, search_results: list[SearchResult]) -> list[SearchResult]:
+        """Keep the synthesis_top_k highest-scoring results, best first."""
+        ranked = sorted(search_results, key=lambda r: r.relevance_score, reverse=True)
+        return ranked[: self.settings.synthesis_top_k]
+
+    def _canonical_answer(self, search_results: list[SearchResult]) -> dict | None:
+        """Return the top result verbatim if it is a near-exact canonical match.
+
+        Args:
+            search_results: Search results ordered by relevance
+
+        Returns:
+            Dict with 'answer' and 'citations', or None if synthesis is needed
+        """
+        if not self.settings.faq_fast_path_enabled:
+            return None
+
+        top = search_results[0]
+        if not top.is_canonical or top.relevance_score < self.settings.faq_match_threshold:
+            return None
+
+        return {
+            "answer": top.content,
+            "citations": [
+                Citation(
+                    entry_id=top.entry_id,
+                    title=top.title,
+                    snippet=top.highlight or top.content[:150],
+                )
+            ],
+        }
+
+    def _max_tokens(self, search_results: list[SearchResult]) -> int:
+        """Scale the answer token budget with the amount of retrieved context."""
+        return min(self.settings.synthesis_max_tokens, 50 + 20 * len(search_results))
+
+    def _build_messages(
+        self, query: str, search_results: list[SearchResult]
+    ) -> list[dict[str, str]]:
+        """Build the chat messages for answer synthesis.
+
+        Args:
+            query: The user's question
+            search_results: Search results to ground the answer
+
+        Returns:
+            List of message dicts with 'role' and 'content'
+        """
+        prompt = SYNTHESIS_PROMPT.format(
+            query=query,
+            results=self._format_results(search_results),
+        )
+        return [
+            {
+                "role": "system",
+                "content": "You are a helpful city services assistant. Provide accurate, helpful answers based on the provided search results.",
+            },
+            {"role": "user", "content": prompt},
+        ]
+
     def _format_results(self, results: list[SearchResult]) -> str:
         """Format search results for the synthesis prompt.
 
+        Each result is rendered on a single pipe-delimited line to keep
+        prompt tokens down.
+
         Args:
             results: List of search results
 
         Returns:
             Formatted string of results
         """
-        formatted = []
-        for i, result in enumerate(results, 1):
-            content = result.content
-            if len(content) > 500:
-                content = content[:500] + "..."
-
-            formatted.append(
-                f"[{i}] {result.title}\n"
-                f"Category: {result.category.value}\n"
-                f"Content: {content}\n"
-            )
-
-        return "\n".join(formatted)
+        # Longer result lists get shorter excerpts to keep the prompt small
+        limit = 300 if len(results) > 5 else 500
+        return "\n".join([
+            f"[{i}] {result.title} | {result.category.value} | {_truncate(result.content, limit)}"
+            for i, result in enumerate(results, 1)
+        ])
 
     def _generate_citations(
         self, results: list[SearchResult], answer: str
     ) -> list[Citation]:
         """Generate citations from search results.
 
+        Includes the top three results, which likely contributed to the
+        answer, plus any result referenced by number in the answer.
+
         Args:
             results: Search results used for the answer
             answer: Generated answer text
@@ -169,26 +350,30 @@ class AnswerAgent(BaseAgent[Tuple[str, list[SearchResult], IntentClassification]
         Returns:
             List of Citation objects
         """
-        citations = []
-
-        for i, result in enumerate(results, 1):
-            # Check if this result is referenced in the answer
-            # We'll include top results that might have contributed
-            if i <= 3 or f"[{i}]" in answer:
-                # Create a relevant snippet
-                snippet = result.highlight or result.content[:150]
-                if len(snippet) > 150 and not result.highlight:
-                    snippet = snippet[:150] + "..."
-
-                citations.append(
-                    Citation(
-                        entry_id=result.entry_id,
-                        title=result.title,
-                        snippet=snippet,
-                    )
-                )
+        referenced = {int(n) for n in _CITE_RE.findall(answer)}
+        return [
+            Citation(
+                entry_id=result.entry_id,
+                title=result.title,
+                snippet=result.highlight or result.content[:150],
+            )
+            for i, result in enumerate(results, 1)
+            if i <= 3 or i in referenced
+        ]
+
 
-        return citations
+def _truncate(text: str, limit: int) -> str:
+    """Truncate text to limit characters, marking the cut with an ellipsis."""
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+@lru_cache(maxsize=1)
+def get_answer_agent() -> AnswerAgent:
+    """Get the global AnswerAgent instance.
+
+    Agents keep no per-request state, so one instance serves all requests.
+    """
+    return AnswerAgent()
 
 
 # Graceful fallback response generator
@@ -202,6 +387,9 @@ def generate_fallback_response(query: str, intent: IntentClassification) -> dict
     Returns:
         Dict with 'answer' and 'citations'
     """
+    if intent.category == Category.GREETING:
+        return {"answer": GREETING_RESPONSE, "citations": []}
+
     category_suggestions = {
         "schedule": "For schedule information, you can check the city calendar at www.example-city.gov/calendar",
         "permit": "For permit inquiries, contact the Planning Department at 555-PLAN",
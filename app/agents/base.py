@@ -6,6 +6,7 @@ the async run() method to process inputs and return AgentResult.
 
 import time
 from abc import ABC, abstractmethod
+from contextvars import ContextVar
 from typing import Any, Generic, TypeVar
 
 from app.models.schemas import AgentResult
@@ -13,16 +14,20 @@ from app.models.schemas import AgentResult
 InputT = TypeVar("InputT")
 OutputT = TypeVar("OutputT")
 
+# Tools used by the current execute() call. Held in a context variable so a
+# single agent instance can serve concurrent requests without sharing state.
+_tools_used: ContextVar[list[str]] = ContextVar("tools_used")
+
 
 class BaseAgent(ABC, Generic[InputT, OutputT]):
     """Abstract base class for all CivicNav agents.
 
     Each agent in the pipeline (Query, Retrieve, Answer) inherits from this
-    base class and implements the run() method to process inputs.
+    base class and implements the run() method to process inputs. Agents
+    hold no per-call state, so one instance can be shared across requests.
 
     Attributes:
         name: Human-readable name for the agent
-        tools_used: List of tool names used during execution
     """
 
     def __init__(self, name: str) -> None:
@@ -32,7 +37,16 @@ class BaseAgent(ABC, Generic[InputT, OutputT]):
             name: Human-readable name for the agent
         """
         self.name = name
-        self.tools_used: list[str] = []
+
+    @property
+    def tools_used(self) -> list[str]:
+        """List of tool names used during the current execution."""
+        try:
+            return _tools_used.get()
+        except LookupError:
+            tools: list[str] = []
+            _tools_used.set(tools)
+            return tools
 
     @abstractmethod
     async def run(self, input_data: InputT) -> AgentResult:
@@ -59,22 +73,25 @@ class BaseAgent(ABC, Generic[InputT, OutputT]):
             AgentResult with timing information
         """
         start_time = time.perf_counter()
-        self.tools_used = []
+        tools_used: list[str] = []
+        token = _tools_used.set(tools_used)
 
         try:
             result = await self.run(input_data)
             elapsed_ms = (time.perf_counter() - start_time) * 1000
             result.latency_ms = elapsed_ms
-            result.tools_used = self.tools_used
+            result.tools_used = tools_used
             return result
         except Exception as e:
             elapsed_ms = (time.perf_counter() - start_time) * 1000
             return AgentResult(
                 output=None,
                 reasoning=f"Error in {self.name}: {str(e)}",
-                tools_used=self.tools_used,
+                tools_used=tools_used,
                 latency_ms=elapsed_ms,
             )
+        finally:
+            _tools_used.reset(token)
 
     def use_tool(self, tool_name: str) -> None:
         """Record that a tool was used during execution.
@@ -6,9 +6,11 @@ relevant entities before the retrieval stage.
 
 import json
 import logging
+from functools import lru_cache
 from typing import Any
 
 from app.agents.base import BaseAgent
+from app.cache import get_intent_cache, query_cache_key
 from app.models.schemas import (
     AgentResult,
     Category,
@@ -21,7 +23,7 @@ from app.tools.openai_tool import get_openai_tool
 logger = logging.getLogger(__name__)
 
 CLASSIFICATION_PROMPT = """You are a city services query classifier. Analyze the user query and return a JSON object with:
-1. category: The service category (one of: schedule, event, report, permit, emergency, general)
+1. category: The service category (one of: schedule, event, report, permit, emergency, general, greeting)
 2. confidence: Your confidence score from 0.0 to 1.0
 3. entities: Array of extracted entities with type, value, start_pos, end_pos
 
@@ -32,6 +34,7 @@ Categories:
 - permit: Questions about permits, applications, licenses, fees
 - emergency: Questions about emergency services, 911, disaster preparedness
 - general: General city information that doesn't fit other categories
+- greeting: Greetings, thanks, or small talk with no city services question
 
 Entity types:
 - date: Dates, days of week, time references
@@ -65,6 +68,7 @@ class QueryAgent(BaseAgent[str, IntentClassification]):
         """Initialize the QueryAgent."""
         super().__init__("QueryAgent")
         self.openai_tool = get_openai_tool()
+        self.cache = get_intent_cache()
 
     async def run(self, input_data: str) -> AgentResult:
         """Classify user intent and extract entities.
@@ -77,6 +81,17 @@ class QueryAgent(BaseAgent[str, IntentClassification]):
         """
         logger.info(f"QueryAgent processing: {input_data[:50]}...")
 
+        # Reuse the classification of an identical earlier query
+        cache_key = query_cache_key(input_data)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"QueryAgent cache hit: {cached.category.value} ({cached.confidence:.2f})")
+            return AgentResult(
+                output=cached,
+                reasoning=f"Reused cached classification '{cached.category.value}' with {cached.confidence:.0%} confidence.",
+                tools_used=self.tools_used,
+            )
+
         self.use_tool("openai_chat")
 
         try:
@@ -125,6 +140,7 @@ class QueryAgent(BaseAgent[str, IntentClassification]):
                 reasoning += f"Extracted {len(entities)} entities."
 
             logger.info(f"QueryAgent result: {intent.category.value} ({intent.confidence:.2f})")
+            self.cache.put(cache_key, intent)
 
             return AgentResult(
                 output=intent,
@@ -148,3 +164,12 @@ class QueryAgent(BaseAgent[str, IntentClassification]):
         except Exception as e:
             logger.error(f"QueryAgent error: {e}")
             raise
+
+
+@lru_cache(maxsize=1)
+def get_query_agent() -> QueryAgent:
+    """Get the global QueryAgent instance.
+
+    Agents keep no per-request state, so one instance serves all requests.
+    """
+    return QueryAgent()
@@ -5,10 +5,12 @@ find relevant knowledge base entries for the user's query.
 """
 
 import logging
+from functools import lru_cache
 from typing import Tuple
 
 from app.agents.base import BaseAgent
-from app.models.schemas import AgentResult, IntentClassification, SearchResult
+from app.cache import get_embedding_cache, query_cache_key
+from app.models.schemas import AgentResult, Category, IntentClassification, SearchResult
 from app.tools.openai_tool import get_openai_tool
 from app.tools.search_tool import get_search_tool
 from app.config import get_settings
@@ -16,11 +18,15 @@ from app.config import get_settings
 logger = logging.getLogger(__name__)
 
 
-class RetrieveAgent(BaseAgent[Tuple[str, IntentClassification], list[SearchResult]]):
+RetrieveInput = Tuple[str, IntentClassification, list[float] | None]
+
+
+class RetrieveAgent(BaseAgent[RetrieveInput, list[SearchResult]]):
     """Agent for retrieving relevant knowledge base entries.
 
-    Takes a tuple of (query, intent) and returns a list of SearchResult
-    objects sorted by relevance using hybrid search.
+    Takes a tuple of (query, intent, embedding) and returns a list of
+    SearchResult objects sorted by relevance using hybrid search. The
+    embedding may be omitted, in which case the agent computes it.
     """
 
     def __init__(self) -> None:
@@ -29,34 +35,44 @@ class RetrieveAgent(BaseAgent[Tuple[str, IntentClassification], list[SearchResul
         self.openai_tool = get_openai_tool()
         self.search_tool = get_search_tool()
         self.settings = get_settings()
+        self.embedding_cache = get_embedding_cache()
+
+    @staticmethod
+    def category_filter(intent: IntentClassification) -> Category | None:
+        """Return the category to filter by, or None if confidence is too low."""
+        return intent.category if intent.confidence >= 0.7 else None
 
-    async def run(
-        self, input_data: Tuple[str, IntentClassification]
-    ) -> AgentResult:
+    async def run(self, input_data: RetrieveInput) -> AgentResult:
         """Retrieve relevant documents using hybrid search.
 
         Args:
-            input_data: Tuple of (query_text, intent_classification)
+            input_data: Tuple of (query_text, intent_classification, embedding).
+                The trailing embedding may be omitted or None.
 
         Returns:
             AgentResult containing list of SearchResult
         """
-        query, intent = input_data
+        query, intent, *rest = input_data
+        embedding = rest[0] if rest else None
         logger.info(f"RetrieveAgent searching for: {query[:50]}...")
 
-        # Generate embedding for vector search
-        self.use_tool("openai_embedding")
-        try:
-            embedding = await self.openai_tool.create_embedding(query)
-        except Exception as e:
-            logger.warning(f"Embedding failed, falling back to keyword search: {e}")
-            embedding = None
+        # Generate embedding for vector search unless the caller supplied one
+        if embedding is None:
+            embedding = self.embedding_cache.get(query_cache_key(query))
+        if embedding is None:
+            self.use_tool("openai_embedding")
+            try:
+                embedding = await self.openai_tool.create_embedding(query)
+                self.embedding_cache.put(query_cache_key(query), embedding)
+            except Exception as e:
+                logger.warning(f"Embedding failed, falling back to keyword search: {e}")
+                embedding = None
 
         # Perform hybrid search
         self.use_tool("search_hybrid")
 
         # Use category filter if high confidence
-        category_filter = intent.category if intent.confidence >= 0.7 else None
+        category_filter = self.category_filter(intent)
 
         if embedding:
             results = await self.search_tool.hybrid_search(
@@ -74,20 +90,23 @@ class RetrieveAgent(BaseAgent[Tuple[str, IntentClassification], list[SearchResul
             )
 
         # Build reasoning explanation
-        reasoning_parts = [
-            f"Performed {'hybrid' if embedding else 'keyword'} search",
-            f"for query: '{query[:30]}...'",
-        ]
-        if category_filter:
-            reasoning_parts.append(f"filtered by category: {category_filter.value}")
-        reasoning_parts.append(f"Found {len(results)} results")
-
-        if results:
-            reasoning_parts.append(
-                f"Top result: '{results[0].title}' (score: {results[0].relevance_score:.2f})"
-            )
-
-        reasoning = ". ".join(reasoning_parts) + "."
+        if self.settings.verbose_reasoning:
+            reasoning_parts = [
+                f"Performed {'hybrid' if embedding else 'keyword'} search",
+                f"for query: '{query[:30]}...'",
+            ]
+            if category_filter:
+                reasoning_parts.append(f"filtered by category: {category_filter.value}")
+            reasoning_parts.append(f"Found {len(results)} results")
+
+            if results:
+                reasoning_parts.append(
+                    f"Top result: '{results[0].title}' (score: {results[0].relevance_score:.2f})"
+                )
+
+            reasoning = ". ".join(reasoning_parts) + "."
+        else:
+            reasoning = f"Found {len(results)} results."
 
         logger.info(f"RetrieveAgent found {len(results)} results")
 
@@ -96,3 +115,38 @@ class RetrieveAgent(BaseAgent[Tuple[str, IntentClassification], list[SearchResul
             reasoning=reasoning,
             tools_used=self.tools_used,
         )
+
+
+async def embed_query(query: str) -> list[float] | None:
+    """Embed a query for vector search, reusing the exact-match embedding cache.
+
+    Args:
+        query: The user's natural language question
+
+    Returns:
+        The query embedding, or None if embedding failed so callers can
+        fall back to keyword search
+    """
+    embedding_cache = get_embedding_cache()
+    cache_key = query_cache_key(query)
+    embedding = embedding_cache.get(cache_key)
+    if embedding is not None:
+        return embedding
+
+    try:
+        embedding = await get_openai_tool().create_embedding(query)
+    except Exception as e:
+        logger.warning(f"Query embedding failed, continuing without it: {e}")
+        return None
+
+    embedding_cache.put(cache_key, embedding)
+    return embedding
+
+
+@lru_cache(maxsize=1)
+def get_retrieve_agent() -> RetrieveAgent:
+    """Get the global RetrieveAgent instance.
+
+    Agents keep no per-request state, so one instance serves all requests.
+    """
+    return RetrieveAgent()
@@ -0,0 +1,446 @@
+"""Caching utilities for CivicNav.
+
+Provides exact-match LRU caches for per-query work (intent classification,
+embeddings) and an in-memory semantic answer cache that reuses previously
+synthesized answers when a new query's embedding is close enough to one
+already answered.
+"""
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Generic, Hashable, TypeVar
+
+import numpy as np
+
+from app.config import get_settings
+from app.models.schemas import Citation, IntentClassification
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# Stay under SQLite's default limit on bound parameters per statement
+_SQLITE_MAX_PARAMS = 900
+
+
+def query_cache_key(query: str) -> str:
+    """Build an exact-match cache key from a normalized query string."""
+    return hashlib.sha1(query.strip().lower().encode("utf-8")).hexdigest()
+
+
+class LRUCache(Generic[K, V]):
+    """Bounded mapping that evicts the least recently used entry.
+
+    Attributes:
+        maxsize: Maximum number of entries kept
+        ttl: Optional lifetime of an entry in seconds
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float | None = None) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            maxsize: Maximum number of entries kept
+            ttl: Optional lifetime of an entry in seconds; entries never
+                expire if None
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[K, tuple[V, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> V | None:
+        """Return the cached value for key, or None on a miss or expiry."""
+        try:
+            value, stored_at = self._data[key]
+        except KeyError:
+            return None
+        if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key: K, value: V) -> None:
+        """Store a value, evicting the oldest entry if the cache is full."""
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def evict(self, predicate: Callable[[V], bool]) -> int:
+        """Remove every entry whose value matches predicate.
+
+        Returns:
+            Number of entries removed
+        """
+        stale = [key for key, (value, _) in self._data.items() if predicate(value)]
+        for key in stale:
+            del self._data[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        self._data.clear()
+
+
+class SemanticAnswerCache:
+    """In-memory cache of synthesized answers keyed by query embedding.
+
+    Embeddings are L2-normalized and written into a ``(max_entries, dim)``
+    matrix allocated on the first store, so a lookup is one matrix-vector
+    product over the filled rows and an insert writes a single row. Entries
+    are evicted least recently used once every slot is taken.
+
+    Attributes:
+        threshold: Minimum cosine similarity for a cache hit
+        max_entries: Maximum number of cached answers
+        ttl: Optional lifetime of an entry in seconds
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.87,
+        max_entries: int = 10000,
+        ttl: float | None = None,
+    ) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a cache hit
+            max_entries: Maximum number of cached answers
+            ttl: Optional lifetime of an entry in seconds; entries never
+                expire if None
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._matrix: np.ndarray | None = None
+        self._entries: list[dict[str, Any]] = []
+        self._last_access = np.zeros(max_entries)
+        self._stored_at = np.zeros(max_entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray:
+        """Convert an embedding to a unit-length float32 vector."""
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, embedding: list[float]) -> tuple[dict[str, Any], float] | None:
+        """Find the cached answer closest to the given embedding.
+
+        Args:
+            embedding: Query embedding vector
+
+        Returns:
+            Tuple of (cached entry, similarity) on a hit, otherwise None
+        """
+        size = len(self._entries)
+        if not size:
+            return None
+
+        now = time.monotonic()
+        scores = self._matrix[:size] @ self._normalize(embedding)
+        if self.ttl is not None:
+            scores[now - self._stored_at[:size] > self.ttl] = -np.inf
+        best = int(np.argmax(scores))
+        similarity = float(scores[best])
+        if similarity < self.threshold:
+            return None
+
+        self._last_access[best] = now
+        return self._entries[best], similarity
+
+    def store(
+        self, embedding: list[float], answer: str, citations: list[Citation]
+    ) -> None:
+        """Add a synthesized answer to the cache.
+
+        Args:
+            embedding: Query embedding vector
+            answer: Synthesized answer text
+            citations: Citations returned with the answer
+        """
+        self.store_entry(embedding, {
+            "answer": answer,
+            "citations": citations,
+            "entry_ids": [c.entry_id for c in citations],
+        })
+
+    def store_entry(self, embedding: list[float], entry: dict[str, Any]) -> None:
+        """Add an arbitrary cache entry keyed by embedding.
+
+        Args:
+            embedding: Query embedding vector
+            entry: Payload returned by lookup on a hit
+        """
+        vec = self._normalize(embedding)
+        if self._matrix is None:
+            self._matrix = np.empty((self.max_entries, vec.shape[0]), dtype=np.float32)
+
+        if len(self._entries) < self.max_entries:
+            slot = len(self._entries)
+            self._entries.append(entry)
+        else:
+            # Overwrite the least recently used slot in place
+            slot = int(np.argmin(self._last_access))
+            self._entries[slot] = entry
+
+        now = time.monotonic()
+        self._matrix[slot] = vec
+        self._last_access[slot] = now
+        self._stored_at[slot] = now
+
+    def evict(self, predicate: Callable[[dict[str, Any]], bool]) -> int:
+        """Remove every entry matching predicate.
+
+        Returns:
+            Number of entries removed
+        """
+        keep = [i for i, entry in enumerate(self._entries) if not predicate(entry)]
+        removed = len(self._entries) - len(keep)
+        if not removed:
+            return 0
+        if not keep:
+            self.clear()
+            return removed
+
+        # Compact the surviving rows into the leading slots
+        size = len(keep)
+        self._matrix[:size] = self._matrix[keep]
+        self._last_access[:size] = self._last_access[keep]
+        self._stored_at[:size] = self._stored_at[keep]
+        self._entries = [self._entries[i] for i in keep]
+        return removed
+
+    def clear(self) -> None:
+        """Remove all cached answers."""
+        self._matrix = None
+        self._entries = []
+        self._last_access[:] = 0.0
+        self._stored_at[:] = 0.0
+
+
+class QueryLog:
+    """Persistent per-query hit counts used to prefetch popular answers.
+
+    Counts are kept in a small SQLite table so the most frequent queries
+    survive restarts and can warm the semantic cache on cold start.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Open (or create) the query log database.
+
+        Args:
+            path: Filesystem path of the SQLite database
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_counts "
+                "(query TEXT PRIMARY KEY, count INTEGER NOT NULL)"
+            )
+
+    def record(self, query: str) -> None:
+        """Increment the hit count for a normalized query."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO query_counts (query, count) VALUES (?, 1) "
+                "ON CONFLICT(query) DO UPDATE SET count = count + 1",
+                (query.strip().lower(),),
+            )
+
+    def top(self, n: int) -> list[str]:
+        """Return the n most frequently recorded queries, most popular first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT query FROM query_counts ORDER BY count DESC LIMIT ?", (n,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+
+class EmbeddingStore:
+    """Content-addressed embedding cache persisted to SQLite.
+
+    Vectors are keyed by ``sha256(model + "\\n" + text)`` and stored as
+    float32 blobs. A bounded in-memory LRU sits in front of the table so
+    hot keys never touch the database. Callers run lookups and writes on
+    worker threads, so one lock guards both the LRU and the connection.
+    """
+
+    def __init__(self, path: str, maxsize: int = 4096) -> None:
+        """Open (or create) the embedding store.
+
+        Args:
+            path: Filesystem path of the SQLite database, or ":memory:"
+            maxsize: Number of vectors kept in the in-memory LRU
+        """
+        self.path = path
+        self._memory: LRUCache[str, list[float]] = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(hash TEXT PRIMARY KEY, vec BLOB NOT NULL)"
+            )
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        """Build the content address for a model/text pair."""
+        return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: set[str]) -> dict[str, list[float] | None]:
+        """Look up several vectors, reading every in-memory miss in one query.
+
+        Args:
+            keys: Content addresses to look up
+
+        Returns:
+            Dict mapping each key to its stored vector, or None on a miss
+        """
+        with self._lock:
+            vectors = {key: self._memory.get(key) for key in keys}
+            misses = [key for key, vector in vectors.items() if vector is None]
+            for start in range(0, len(misses), _SQLITE_MAX_PARAMS):
+                chunk = misses[start:start + _SQLITE_MAX_PARAMS]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT hash, vec FROM embeddings WHERE hash IN ({placeholders})", chunk
+                )
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                    self._memory.put(key, vector)
+                    vectors[key] = vector
+        return vectors
+
+    def put_many(self, items: dict[str, list[float]]) -> None:
+        """Store several vectors, replacing any existing entries."""
+        with self._lock, self._conn:
+            for key, vector in items.items():
+                self._memory.put(key, vector)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)",
+                [
+                    (key, np.asarray(vector, dtype=np.float32).tobytes())
+                    for key, vector in items.items()
+                ],
+            )
+
+    def clear(self) -> None:
+        """Remove all stored vectors."""
+        with self._lock, self._conn:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM embeddings")
+
+
+# Global instances for convenience
+_embedding_store: EmbeddingStore | None = None
+_intent_cache: LRUCache[str, IntentClassification] | None = None
+_embedding_cache: LRUCache[str, list[float]] | None = None
+_semantic_cache: SemanticAnswerCache | None = None
+_query_log: QueryLog | None = None
+
+
+def get_intent_cache() -> LRUCache[str, IntentClassification]:
+    """Get the global exact-match intent classification cache."""
+    global _intent_cache
+    if _intent_cache is None:
+        _intent_cache = LRUCache(maxsize=get_settings().query_cache_max_entries)
+    return _intent_cache
+
+
+def get_embedding_cache() -> LRUCache[str, list[float]]:
+    """Get the global exact-match query embedding cache."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = LRUCache(maxsize=get_settings().query_cache_max_entries)
+    return _embedding_cache
+
+
+def get_embedding_store() -> EmbeddingStore:
+    """Get the global persistent embedding store.
+
+    Uses an in-memory database when no store path is configured.
+    """
+    global _embedding_store
+    if _embedding_store is None:
+        _embedding_store = EmbeddingStore(get_settings().embedding_store_path or ":memory:")
+    return _embedding_store
+
+
+def get_semantic_cache() -> SemanticAnswerCache:
+    """Get the global semantic answer cache instance."""
+    global _semantic_cache
+    if _semantic_cache is None:
+        settings = get_settings()
+        _semantic_cache = SemanticAnswerCache(
+            threshold=settings.semantic_cache_threshold,
+            max_entries=settings.semantic_cache_max_entries,
+            ttl=settings.semantic_cache_ttl_seconds,
+        )
+    return _semantic_cache
+
+
+def get_query_log() -> QueryLog:
+    """Get the global query log instance."""
+    global _query_log
+    if _query_log is None:
+        _query_log = QueryLog(get_settings().query_log_path)
+    return _query_log
+
+
+@lru_cache(maxsize=1)
+def get_local_embedder() -> Any | None:
+    """Get the local SentenceTransformer used for semantic cache keys.
+
+    Returns None when no local model is configured or sentence-transformers
+    is not installed, in which case the query's retrieval embedding is used.
+    The outcome is cached, so a missing package is reported only once.
+    """
+    model_name = get_settings().semantic_cache_local_model
+    if not model_name:
+        return None
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        logger.warning("sentence-transformers not installed, using remote embeddings for the semantic cache")
+        return None
+    embedder = SentenceTransformer(model_name, device="cpu")
+    logger.info(f"Loaded local semantic cache embedder {model_name}")
+    return embedder
+
+
+async def semantic_cache_embedding(
+    query: str, embedding: list[float] | None
+) -> list[float] | None:
+    """Return the vector used to key the semantic answer cache for a query.
+
+    Args:
+        query: The user's natural language question
+        embedding: The query's retrieval embedding, if one was computed
+
+    Returns:
+        A local model embedding of the query when one is configured,
+        otherwise the retrieval embedding
+    """
+    embedder = get_local_embedder()
+    if embedder is None:
+        return embedding
+    vector = await asyncio.to_thread(embedder.encode, query)
+    return vector.tolist()
@@ -33,6 +33,7 @@ class Settings(BaseSettings):
     debug: bool = False
     log_level: str = "INFO"
     demo_mode: bool = True  # Run with mock data when Azure services unavailable
+    verbose_reasoning: bool = True  # Include per-stage reasoning detail in responses
 
     # Ollama Configuration (for demo mode with local LLM)
     ollama_endpoint: str = "http://localhost:11434"
@@ -46,7 +47,45 @@ class Settings(BaseSettings):
 
     # Performance Configuration
     search_top_k: int = 5
+    categories_cache_ttl_seconds: int = 60  # Category counts only change on ingestion; bounds their staleness
     embedding_dimensions: int = 1536
+    embedding_batch_size: int = 64  # Max texts coalesced into one embeddings request
+    embedding_batch_wait_ms: float = 5.0  # Max time a text waits for its batch
+    synthesis_model: str = ""  # Model/deployment for AnswerAgent; empty uses the chat default
+    synthesis_max_tokens: int = 256  # Upper bound on synthesized answer length
+    synthesis_top_k: int = 5  # Results included in the synthesis prompt
+
+    # Cache Configuration
+    query_cache_max_entries: int = 2048  # Exact-match intent/embedding LRU size
+    embedding_store_path: str = "data/embedding_cache.db"  # Persistent embeddings; empty keeps them in memory
+    semantic_cache_enabled: bool = True
+    semantic_cache_threshold: float = 0.87  # Minimum cosine similarity for a hit
+    semantic_cache_max_entries: int = 10000
+    semantic_cache_ttl_seconds: int = 3600  # Bounds staleness after the knowledge base changes
+    semantic_cache_local_model: str = ""  # e.g. all-MiniLM-L6-v2; requires sentence-transformers
+
+    # MCP Response Cache Configuration (opt in with CIVICNAV_SEMANTIC_CACHE=1)
+    civicnav_semantic_cache: bool = False
+    mcp_cache_ttl_seconds: int = 3600
+    mcp_cache_max_entries: int = 1024
+    mcp_cache_threshold: float = 0.93  # Stricter than the answer cache; hits skip all three agents
+
+    # Search Result Configuration
+    trusted_search_source: bool = False  # Skip validating hits from our own index schema
+
+    # FAQ Fast Path Configuration
+    faq_fast_path_enabled: bool = True  # Return canonical answers without synthesis
+    faq_match_threshold: float = 0.92  # Minimum top-result relevance (reranker score / 4 in Azure) for the fast path
+
+    # Startup Configuration
+    warmup_connections: bool = True  # Open Azure connections and fetch tokens at boot
+
+    # Prefetch Configuration (warms the semantic cache with popular queries)
+    prefetch_enabled: bool = False
+    prefetch_top_n: int = 20
+    prefetch_interval_seconds: int = 3600
+    prefetch_concurrency: int = 4
+    query_log_path: str = "data/query_log.db"
 
     @property
     def is_configured(self) -> bool:
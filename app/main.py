@@ -3,27 +3,34 @@
 City services Q&A API with agentic RAG pipeline.
 """
 
+import asyncio
+import json
 import logging
 import time
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any, AsyncGenerator
-from uuid import uuid4
+from typing import Annotated, Any, AsyncGenerator
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
-from app.agents.query_agent import QueryAgent
-from app.agents.retrieve_agent import RetrieveAgent
-from app.agents.answer_agent import AnswerAgent
+from app.agents.query_agent import QueryAgent, get_query_agent
+from app.agents.retrieve_agent import RetrieveAgent, embed_query, get_retrieve_agent
+from app.agents.answer_agent import AnswerAgent, generate_fallback_response, get_answer_agent
+from app.cache import (
+    get_local_embedder,
+    get_query_log,
+    get_semantic_cache,
+    semantic_cache_embedding,
+)
 from app.config import get_settings
 from app.models.schemas import (
+    AgentResult,
     Category,
     CategoryInfo,
     CategoriesResponse,
-    Citation,
     ErrorResponse,
     FeedbackRequest,
     FeedbackResponse,
@@ -36,9 +43,12 @@ from app.models.schemas import (
     SearchResponse,
     ServiceHealth,
     ServicesStatus,
+    uuid7,
 )
-from app.tools.openai_tool import get_openai_tool
-from app.tools.search_tool import get_search_tool
+from app.tools.credential import close_credential
+from app.tools.http_client import close_http_client, get_http_client
+from app.tools.openai_tool import DemoOpenAITool, OpenAITool, get_openai_tool
+from app.tools.search_tool import DemoSearchTool, SearchTool, get_search_tool
 
 # Configure logging
 logging.basicConfig(
@@ -48,6 +58,58 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def _prefetch_popular_queries() -> None:
+    """Run the pipeline for popular queries that miss the semantic cache.
+
+    Answers produced this way are stored in the semantic cache by
+    AnswerAgent, so later users asking the same thing skip the LLM call.
+    """
+    settings = get_settings()
+    queries = await asyncio.to_thread(get_query_log().top, settings.prefetch_top_n)
+    semaphore = asyncio.Semaphore(settings.prefetch_concurrency)
+    semantic_cache = get_semantic_cache()
+
+    async def prefetch(query: str) -> None:
+        async with semaphore:
+            embedding = await embed_query(query)
+            cache_key = await semantic_cache_embedding(query, embedding)
+            if cache_key is None or semantic_cache.lookup(cache_key) is not None:
+                return
+            query_result, retrieve_result, embedding = await _classify_and_retrieve(
+                query, get_query_agent(), get_retrieve_agent()
+            )
+            if retrieve_result is None:
+                return
+            await get_answer_agent().execute(
+                (query, retrieve_result.output or [], query_result.output, embedding)
+            )
+
+    results = await asyncio.gather(*(prefetch(q) for q in queries), return_exceptions=True)
+    failures = sum(1 for r in results if isinstance(r, Exception))
+    logger.info(f"Prefetched {len(queries) - failures}/{len(queries)} popular queries")
+
+
+async def _prefetch_loop() -> None:
+    """Periodically warm the semantic cache with popular queries."""
+    interval = get_settings().prefetch_interval_seconds
+    while True:
+        try:
+            await _prefetch_popular_queries()
+        except Exception as e:
+            logger.warning(f"Prefetch pass failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def _record_query(query: str) -> None:
+    """Count the query towards popularity for prefetching, if enabled."""
+    if not get_settings().prefetch_enabled:
+        return
+    try:
+        await asyncio.to_thread(get_query_log().record, query)
+    except Exception as e:
+        logger.warning(f"Failed to record query for prefetch: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """Application lifespan handler."""
@@ -57,7 +119,31 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         logger.info("Azure services configured")
     else:
         logger.warning("Azure services not fully configured - running in limited mode")
+
+    # Build the shared HTTP client and agent instances once instead of on the first request
+    get_http_client()
+    await asyncio.to_thread(get_local_embedder)
+    get_query_agent()
+    get_retrieve_agent()
+    get_answer_agent()
+    if settings.warmup_connections:
+        # Pay credential probing and TLS setup now rather than on the first query
+        await asyncio.gather(
+            _check_connection("OpenAI", get_openai_tool()),
+            _check_connection("Search", get_search_tool()),
+        )
+
+    prefetch_task = None
+    if settings.prefetch_enabled:
+        prefetch_task = asyncio.create_task(_prefetch_loop())
+
     yield
+
+    if prefetch_task is not None:
+        prefetch_task.cancel()
+    await get_search_tool().close()
+    await close_credential()
+    await close_http_client()
     logger.info("CivicNav shutting down...")
 
 
@@ -81,35 +167,128 @@ app.add_middleware(
 
 # Error handler
 @app.exception_handler(HTTPException)
-async def http_exception_handler(request: Request, exc: HTTPException) -> JSONResponse:
+async def http_exception_handler(request: Request, exc: HTTPException) -> Response:
     """Handle HTTP exceptions."""
-    return JSONResponse(
-        status_code=exc.status_code,
-        content=ErrorResponse(
+    return _error_response(
+        exc.status_code,
+        ErrorResponse(
             error=f"HTTP_{exc.status_code}",
             message=exc.detail,
-        ).model_dump(),
+        ),
     )
 
 
+# Body returned for unexpected failures, over plain HTTP or as an SSE error event
+_INTERNAL_ERROR = ErrorResponse(
+    error="INTERNAL_ERROR",
+    message="An internal error occurred. Please try again later.",
+)
+
+
 @app.exception_handler(Exception)
-async def general_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+async def general_exception_handler(request: Request, exc: Exception) -> Response:
     """Handle general exceptions."""
     logger.error(f"Unhandled exception: {exc}", exc_info=True)
-    return JSONResponse(
-        status_code=500,
-        content=ErrorResponse(
-            error="INTERNAL_ERROR",
-            message="An internal error occurred. Please try again later.",
-        ).model_dump(),
+    return _error_response(500, _INTERNAL_ERROR)
+
+
+def _error_response(status_code: int, error: ErrorResponse) -> Response:
+    """Serialize an error body straight to JSON bytes with Pydantic."""
+    return Response(
+        content=error.model_dump_json(),
+        status_code=status_code,
+        media_type="application/json",
     )
 
 
+# Dependencies
+#
+# Declared async so FastAPI resolves them inline rather than dispatching the
+# sync getters to its threadpool. Tests swap them via app.dependency_overrides.
+
+
+async def provide_query_agent() -> QueryAgent:
+    """Provide the shared QueryAgent."""
+    return get_query_agent()
+
+
+async def provide_retrieve_agent() -> RetrieveAgent:
+    """Provide the shared RetrieveAgent."""
+    return get_retrieve_agent()
+
+
+async def provide_answer_agent() -> AnswerAgent:
+    """Provide the shared AnswerAgent."""
+    return get_answer_agent()
+
+
+async def provide_openai_tool() -> OpenAITool | DemoOpenAITool:
+    """Provide the shared OpenAI tool."""
+    return get_openai_tool()
+
+
+async def provide_search_tool() -> SearchTool | DemoSearchTool:
+    """Provide the shared search tool."""
+    return get_search_tool()
+
+
+QueryAgentDep = Annotated[QueryAgent, Depends(provide_query_agent)]
+RetrieveAgentDep = Annotated[RetrieveAgent, Depends(provide_retrieve_agent)]
+AnswerAgentDep = Annotated[AnswerAgent, Depends(provide_answer_agent)]
+OpenAIToolDep = Annotated[OpenAITool | DemoOpenAITool, Depends(provide_openai_tool)]
+SearchToolDep = Annotated[SearchTool | DemoSearchTool, Depends(provide_search_tool)]
+
+
 # API Endpoints
 
 
+async def _classify_and_retrieve(
+    query: str,
+    query_agent: QueryAgent,
+    retrieve_agent: RetrieveAgent,
+) -> tuple[AgentResult, AgentResult | None, list[float] | None]:
+    """Run the query and retrieve stages shared by the query endpoints.
+
+    The query embedding does not depend on the classified intent, so it is
+    requested concurrently with intent classification. Retrieval is skipped
+    for greetings and other out-of-scope queries.
+
+    Args:
+        query: The user's natural language question
+        query_agent: Agent that classifies the query's intent
+        retrieve_agent: Agent that searches the knowledge base
+
+    Returns:
+        Tuple of (query_result, retrieve_result, query_embedding), where
+        retrieve_result is None if the query was out of scope
+    """
+    # Stage 1: Query Agent - Intent Classification, overlapped with embedding
+    query_result, embedding = await asyncio.gather(
+        query_agent.execute(query),
+        embed_query(query),
+    )
+
+    if query_result.output is None:
+        raise HTTPException(status_code=500, detail="Query classification failed")
+
+    intent: IntentClassification = query_result.output
+    if intent.is_out_of_scope:
+        logger.info(f"Out-of-scope query ({intent.category.value}), skipping retrieval")
+        return query_result, None, embedding
+
+    # Stage 2: Retrieve Agent - Hybrid Search
+    retrieve_result = await retrieve_agent.execute((query, intent, embedding))
+
+    return query_result, retrieve_result, embedding
+
+
 @app.post("/api/query", response_model=QueryResponse, tags=["Query"])
-async def submit_query(request: QueryRequest) -> QueryResponse:
+async def submit_query(
+    request: QueryRequest,
+    query_agent: QueryAgentDep,
+    retrieve_agent: RetrieveAgentDep,
+    answer_agent: AnswerAgentDep,
+) -> QueryResponse:
     """Submit a natural language query through the agentic pipeline.
 
     Processes a natural language question through:
@@ -119,26 +298,33 @@ async def submit_query(request: QueryRequest) -> QueryResponse:
     """
     start_time = time.perf_counter()
     logger.info(f"Query received: {request.query[:50]}...")
+    await _record_query(request.query)
 
     try:
-        # Stage 1: Query Agent - Intent Classification
-        query_agent = QueryAgent()
-        query_result = await query_agent.execute(request.query)
-
-        if query_result.output is None:
-            raise HTTPException(status_code=500, detail="Query classification failed")
+        # Stages 1-2: Intent Classification and Hybrid Search
+        query_result, retrieve_result, embedding = await _classify_and_retrieve(
+            request.query, query_agent, retrieve_agent
+        )
 
         intent: IntentClassification = query_result.output
 
-        # Stage 2: Retrieve Agent - Hybrid Search
-        retrieve_agent = RetrieveAgent()
-        retrieve_result = await retrieve_agent.execute((request.query, intent))
+        if retrieve_result is None:
+            fallback = generate_fallback_response(request.query, intent)
+            return QueryResponse(
+                id=uuid7(),
+                answer=fallback["answer"],
+                citations=fallback["citations"],
+                intent=intent,
+                reasoning=f"{query_result.reasoning} | Out-of-scope query; skipped retrieval and synthesis.",
+                latency_ms=(time.perf_counter() - start_time) * 1000,
+            )
 
         search_results = retrieve_result.output or []
 
         # Stage 3: Answer Agent - Response Synthesis
-        answer_agent = AnswerAgent()
-        answer_result = await answer_agent.execute((request.query, search_results, intent))
+        answer_result = await answer_agent.execute(
+            (request.query, search_results, intent, embedding)
+        )
 
         if answer_result.output is None:
             raise HTTPException(status_code=500, detail="Answer synthesis failed")
@@ -150,14 +336,15 @@ async def submit_query(request: QueryRequest) -> QueryResponse:
 
         # Build response
         response = QueryResponse(
-            id=uuid4(),
+            id=uuid7(),
             answer=answer_data["answer"],
-            citations=[
-                Citation(**c) if isinstance(c, dict) else c
-                for c in answer_data.get("citations", [])
-            ],
+            citations=answer_data["citations"],
             intent=intent,
-            reasoning=f"{query_result.reasoning} | {retrieve_result.reasoning} | {answer_result.reasoning}",
+            reasoning=(
+                f"{query_result.reasoning} | {retrieve_result.reasoning} | {answer_result.reasoning}"
+                if get_settings().verbose_reasoning
+                else f"{intent.category.value} | {len(search_results)} results"
+            ),
             latency_ms=total_latency,
         )
 
@@ -171,8 +358,70 @@ async def submit_query(request: QueryRequest) -> QueryResponse:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/query/stream", tags=["Query"])
+async def submit_query_stream(
+    request: QueryRequest,
+    query_agent: QueryAgentDep,
+    retrieve_agent: RetrieveAgentDep,
+    answer_agent: AnswerAgentDep,
+) -> StreamingResponse:
+    """Submit a query and stream the synthesized answer as Server-Sent Events.
+
+    Runs the same pipeline as ``/api/query`` but streams AnswerAgent output.
+    Emits ``data: {"token": ...}`` frames as the answer is generated, then a
+    terminal ``data: {"citations": [...], "intent": {...}}`` frame. If the
+    answer stage fails mid-stream, the terminal frame is instead an
+    ``event: error`` carrying an ``ErrorResponse`` body.
+    """
+    logger.info(f"Streaming query received: {request.query[:50]}...")
+    await _record_query(request.query)
+
+    try:
+        query_result, retrieve_result, embedding = await _classify_and_retrieve(
+            request.query, query_agent, retrieve_agent
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Query processing failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    intent: IntentClassification = query_result.output
+
+    async def out_of_scope_events() -> AsyncGenerator[dict[str, Any], None]:
+        fallback = generate_fallback_response(request.query, intent)
+        yield {"token": fallback["answer"]}
+        yield {"citations": fallback["citations"]}
+
+    if retrieve_result is None:
+        events = out_of_scope_events()
+    else:
+        events = answer_agent.run_stream(
+            (request.query, retrieve_result.output or [], intent, embedding)
+        )
+
+    async def event_generator() -> AsyncGenerator[str, None]:
+        try:
+            async for event in events:
+                if "citations" in event:
+                    event = {
+                        "citations": [c.model_dump() for c in event["citations"]],
+                        "intent": intent.model_dump(mode="json"),
+                    }
+                yield f"data: {json.dumps(event)}\n\n"
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band before closing
+            logger.error(f"Answer stream failed: {e}", exc_info=True)
+            yield f"event: error\ndata: {_INTERNAL_ERROR.model_dump_json()}\n\n"
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
 @app.post("/api/search", response_model=SearchResponse, tags=["Search"])
-async def search_knowledge_base(request: SearchRequest) -> SearchResponse:
+async def search_knowledge_base(
+    request: SearchRequest,
+    search_tool: SearchToolDep,
+) -> SearchResponse:
     """Perform direct search without running the full agentic pipeline.
 
     Returns raw search results for the given query.
@@ -180,8 +429,6 @@ async def search_knowledge_base(request: SearchRequest) -> SearchResponse:
     logger.info(f"Search request: {request.query[:50]}...")
 
     try:
-        search_tool = get_search_tool()
-
         # Use keyword search for direct search endpoint
         results = await search_tool.keyword_search(
             query=request.query,
@@ -200,12 +447,11 @@ async def search_knowledge_base(request: SearchRequest) -> SearchResponse:
 
 
 @app.get("/api/categories", response_model=CategoriesResponse, tags=["Categories"])
-async def list_categories() -> CategoriesResponse:
+async def list_categories(search_tool: SearchToolDep) -> CategoriesResponse:
     """List all available service categories with entry counts."""
     logger.info("Categories request")
 
     try:
-        search_tool = get_search_tool()
         category_counts = await search_tool.get_categories()
 
         categories = [
@@ -233,32 +479,38 @@ async def submit_feedback(request: FeedbackRequest) -> FeedbackResponse:
     # In a production system, this would store feedback in a database
     # For the lab, we just acknowledge receipt
     return FeedbackResponse(
-        id=uuid4(),
+        id=uuid7(),
         status="received",
     )
 
 
+async def _check_connection(name: str, tool: Any) -> bool:
+    """Probe a tool's connection, treating any failure as disconnected."""
+    try:
+        return await tool.check_connection()
+    except Exception as e:
+        logger.warning(f"{name} health check failed: {e}")
+        return False
+
+
 @app.get("/health", response_model=HealthResponse, tags=["Health"])
-async def health_check() -> HealthResponse:
+async def health_check(
+    openai_tool: OpenAIToolDep,
+    search_tool: SearchToolDep,
+) -> HealthResponse:
     """Check service health status."""
     settings = get_settings()
 
-    # Check service connections
+    # Check service connections concurrently
+    openai_ok, search_ok = await asyncio.gather(
+        _check_connection("OpenAI", openai_tool),
+        _check_connection("Search", search_tool),
+    )
     services = ServicesStatus()
-
-    try:
-        openai_tool = get_openai_tool()
-        if await openai_tool.check_connection():
-            services.openai = ServiceHealth.CONNECTED
-    except Exception as e:
-        logger.warning(f"OpenAI health check failed: {e}")
-
-    try:
-        search_tool = get_search_tool()
-        if await search_tool.check_connection():
-            services.search = ServiceHealth.CONNECTED
-    except Exception as e:
-        logger.warning(f"Search health check failed: {e}")
+    if openai_ok:
+        services.openai = ServiceHealth.CONNECTED
+    if search_ok:
+        services.search = ServiceHealth.CONNECTED
 
     # Determine overall health
     if services.openai == ServiceHealth.CONNECTED and services.search == ServiceHealth.CONNECTED:
@@ -6,17 +6,32 @@ Tools: civicnav_query, civicnav_search, civicnav_categories, civicnav_feedback
 
 import asyncio
 import logging
-from typing import Any
-from uuid import uuid4
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
 
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
-
-from app.agents.query_agent import QueryAgent
-from app.agents.retrieve_agent import RetrieveAgent
-from app.agents.answer_agent import AnswerAgent
-from app.models.schemas import Category, FeedbackRequest
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+
+from app.agents.query_agent import get_query_agent
+from app.agents.retrieve_agent import RetrieveAgent, embed_query, get_retrieve_agent
+from app.agents.answer_agent import AnswerAgent, AnswerInput, get_answer_agent
+from app.config import get_settings
+from app.cache import LRUCache, SemanticAnswerCache
+from app.models.schemas import (
+    Category,
+    Citation,
+    FeedbackRequest,
+    IntentClassification,
+    SearchResult,
+    uuid7,
+)
+from app.tools.credential import close_credential
+from app.tools.http_client import close_http_client, get_http_client
+from app.tools.openai_tool import get_openai_tool
 from app.tools.search_tool import get_search_tool
 
 logging.basicConfig(level=logging.INFO)
@@ -25,42 +40,230 @@ logger = logging.getLogger(__name__)
 # Create MCP server
 server = Server("civicnav")
 
+# Receives answer tokens while civicnav_query streams; None when buffering
+TokenSink = Callable[[str], Awaitable[None]]
+_token_sink: ContextVar[TokenSink | None] = ContextVar("token_sink", default=None)
 
-# Internal functions that do the actual work
+# Serializers compiled once and reused for every response
+_CITATIONS = TypeAdapter(list[Citation])
+_SEARCH_RESULTS = TypeAdapter(list[SearchResult])
 
 
-async def submit_query_internal(query: str) -> dict[str, Any]:
-    """Process a query through the agentic pipeline."""
-    try:
-        # Stage 1: Query Agent
-        query_agent = QueryAgent()
-        query_result = await query_agent.execute(query)
-        intent = query_result.output
+# Response caches for civicnav_query, created on first use
+_response_cache: LRUCache[str, dict[str, Any]] | None = None
+_semantic_response_cache: SemanticAnswerCache | None = None
+
 
-        # Stage 2: Retrieve Agent
-        retrieve_agent = RetrieveAgent()
-        retrieve_result = await retrieve_agent.execute((query, intent))
-        search_results = retrieve_result.output or []
+def get_response_caches() -> tuple[LRUCache[str, dict[str, Any]], SemanticAnswerCache]:
+    """Get the exact-match and semantic civicnav_query response caches."""
+    global _response_cache, _semantic_response_cache
+    if _response_cache is None or _semantic_response_cache is None:
+        settings = get_settings()
+        _response_cache = LRUCache(
+            maxsize=settings.mcp_cache_max_entries,
+            ttl=settings.mcp_cache_ttl_seconds,
+        )
+        _semantic_response_cache = SemanticAnswerCache(
+            threshold=settings.mcp_cache_threshold,
+            max_entries=settings.mcp_cache_max_entries,
+            ttl=settings.mcp_cache_ttl_seconds,
+        )
+    return _response_cache, _semantic_response_cache
 
-        # Stage 3: Answer Agent
-        answer_agent = AnswerAgent()
-        answer_result = await answer_agent.execute((query, search_results, intent))
-        answer_data = answer_result.output
+
+# Internal functions that do the actual work
+
+
+async def cached_submit_query(query: str, category: str | None = None) -> dict[str, Any]:
+    """Serve repeat and near-duplicate queries from the response caches.
+
+    Exact repeats (after normalization) hit a TTL cache; otherwise the
+    query embedding is compared against previously answered queries.
+    Falls through to the full pipeline when caching is disabled or misses.
+    Queries with a category hint only use the exact cache, keyed by category,
+    since a near-duplicate may have been answered under another category.
+    """
+    if not get_settings().civicnav_semantic_cache:
+        return await submit_query_internal(query, category)
+
+    exact_cache, semantic_cache = get_response_caches()
+    key = f"{category or ''}:{query.strip().lower()}"
+    cached = exact_cache.get(key)
+    if cached is not None:
+        return cached
+
+    embedding = await embed_query(query) if category is None else None
+    if embedding is not None:
+        hit = semantic_cache.lookup(embedding)
+        if hit is not None:
+            return hit[0]["response"]
+
+    result = await submit_query_internal(query, category)
+    if "error" not in result:
+        exact_cache.put(key, result)
+        if embedding is not None:
+            semantic_cache.store_entry(embedding, {"response": result})
+    return result
+
+
+async def submit_query_internal(query: str, category: str | None = None) -> dict[str, Any]:
+    """Process a query through the agentic pipeline.
+
+    Intent classification and the query embedding start together. If the
+    embedding fails, an unfiltered keyword search starts at once, still
+    overlapped with classification, and its results are reused when they
+    match what the category-filtered keyword search would return.
+    A category hint from the caller replaces classification entirely.
+    """
+    start_time = time.perf_counter()
+    speculative: asyncio.Task[list[SearchResult]] | None = None
+    try:
+        # Stage 1: Query Agent, overlapped with embedding (or its keyword fallback)
+        if category is not None:
+            intent = IntentClassification(category=Category(category), confidence=1.0)
+            embedding = await embed_query(query)
+        else:
+            query_agent = get_query_agent()
+            query_result, (embedding, speculative) = await asyncio.gather(
+                query_agent.execute(query),
+                _embed_or_search(query),
+            )
+            intent = query_result.output
+
+        # Stage 2: Retrieve Agent, unless the speculative search already answers it
+        search_results = None
+        if speculative is not None:
+            search_results = await _reuse_speculative(speculative, intent)
+        if search_results is None:
+            retrieve_agent = get_retrieve_agent()
+            retrieve_result = await retrieve_agent.execute((query, intent, embedding))
+            search_results = retrieve_result.output or []
+
+        # Stage 3: Answer Agent, streamed to the client if it asked for progress
+        answer_agent = get_answer_agent()
+        answer_input = (query, search_results, intent, embedding)
+        on_token = _token_sink.get()
+        if on_token is None:
+            answer_data = (await answer_agent.execute(answer_input)).output
+        else:
+            answer_data = await _stream_answer(answer_agent, answer_input, on_token)
 
         return {
+            "id": str(uuid7()),
             "answer": answer_data["answer"],
-            "citations": [c.model_dump() if hasattr(c, "model_dump") else c
-                         for c in answer_data.get("citations", [])],
-            "intent": {
-                "category": intent.category.value,
-                "confidence": intent.confidence,
-                "entities": [e.model_dump() for e in intent.entities],
-            },
-            "latency_ms": query_result.latency_ms + retrieve_result.latency_ms + answer_result.latency_ms,
+            "citations": _CITATIONS.dump_python(answer_data["citations"], mode="json"),
+            "intent": intent.model_dump(mode="json"),
+            "latency_ms": (time.perf_counter() - start_time) * 1000,
         }
     except Exception as e:
         logger.error(f"Query failed: {e}")
         return {"error": str(e)}
+    finally:
+        if speculative is not None:
+            speculative.cancel()
+
+
+async def _stream_answer(
+    answer_agent: AnswerAgent,
+    answer_input: AnswerInput,
+    on_token: TokenSink,
+) -> dict[str, Any]:
+    """Run the answer stage token by token, forwarding each token to on_token.
+
+    Returns:
+        Dict with the assembled 'answer' and its 'citations'
+    """
+    chunks: list[str] = []
+    citations: list[Citation] = []
+    async for event in answer_agent.run_stream(answer_input):
+        if "token" in event:
+            chunks.append(event["token"])
+            await on_token(event["token"])
+        else:
+            citations = event["citations"]
+    return {"answer": "".join(chunks), "citations": citations}
+
+
+def _progress_sender() -> TokenSink | None:
+    """Build a callback forwarding answer tokens as MCP progress notifications.
+
+    Returns None outside a request or when the client sent no progress token.
+    """
+    try:
+        ctx = server.request_context
+    except LookupError:
+        return None
+    progress_token = ctx.meta.progressToken if ctx.meta else None
+    if progress_token is None:
+        return None
+
+    sent = 0
+
+    async def send(text: str) -> None:
+        nonlocal sent
+        sent += 1
+        await ctx.session.send_progress_notification(progress_token, sent, message=text)
+
+    return send
+
+
+async def _embed_or_search(
+    query: str,
+) -> tuple[list[float] | None, asyncio.Task[list[SearchResult]] | None]:
+    """Embed a query, starting an unfiltered keyword search if that fails.
+
+    The search only runs when hybrid retrieval is impossible, so the normal
+    path costs a single Search call.
+
+    Returns:
+        Tuple of (embedding, None), or (None, task running the keyword search)
+    """
+    embedding = await embed_query(query)
+    if embedding is not None:
+        return embedding, None
+
+    speculative = asyncio.create_task(
+        get_search_tool().keyword_search(
+            query=query,
+            top_k=get_settings().search_top_k,
+            category=None,
+        )
+    )
+    # Mark any failure as retrieved; it only matters if the results are reused
+    speculative.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return None, speculative
+
+
+async def _reuse_speculative(
+    speculative: asyncio.Task, intent: IntentClassification
+) -> list[SearchResult] | None:
+    """Return speculative keyword results if they equal the filtered search.
+
+    The unfiltered top-k restricted to the intent's category is exactly the
+    filtered top-k when every result already matches the category, or when
+    fewer than top-k results matched the query at all.
+
+    Args:
+        speculative: Task running the unfiltered keyword search
+        intent: The classified intent
+
+    Returns:
+        Reusable search results, or None if a fresh search is needed
+    """
+    try:
+        results = await speculative
+    except Exception as e:
+        logger.warning(f"Speculative search failed: {e}")
+        return None
+
+    category = RetrieveAgent.category_filter(intent)
+    if category is None:
+        return results
+
+    matching = [r for r in results if r.category == category]
+    if len(matching) == len(results) or len(results) < get_settings().search_top_k:
+        return matching
+    return None
 
 
 async def search_internal(query: str, top_k: int, category: str | None) -> dict[str, Any]:
@@ -76,7 +279,7 @@ async def search_internal(query: str, top_k: int, category: str | None) -> dict[
         )
 
         return {
-            "results": [r.model_dump() for r in results],
+            "results": _SEARCH_RESULTS.dump_python(results, mode="json"),
             "total_count": len(results),
         }
     except Exception as e:
@@ -102,10 +305,14 @@ async def get_categories_internal() -> dict[str, Any]:
 
 
 async def submit_feedback_internal(answer_id: str, rating: int, comment: str | None) -> dict[str, Any]:
-    """Submit feedback."""
+    """Submit feedback, dropping poorly rated answers from the response caches."""
+    if rating <= 2 and _response_cache is not None and _semantic_response_cache is not None:
+        _response_cache.evict(lambda response: response["id"] == answer_id)
+        _semantic_response_cache.evict(lambda entry: entry["response"]["id"] == answer_id)
+
     # In production, this would store to a database
     return {
-        "id": str(uuid4()),
+        "id": str(uuid7()),
         "status": "received",
     }
 
@@ -127,6 +334,11 @@ async def list_tools() -> list[Tool]:
                         "type": "string",
                         "description": "The question to ask about city services",
                     },
+                    "category": {
+                        "type": "string",
+                        "description": "Known category for the question; skips intent classification",
+                        "enum": ["schedule", "event", "report", "permit", "emergency", "general"],
+                    },
                 },
                 "required": ["query"],
             },
@@ -196,7 +408,11 @@ async def call_tool(name: str, arguments: dict[str, Any]) -> list[TextContent]:
     logger.info(f"Tool call: {name} with args: {arguments}")
 
     if name == "civicnav_query":
-        result = await civicnav_query(arguments["query"])
+        sink = _token_sink.set(_progress_sender())
+        try:
+            result = await civicnav_query(arguments["query"], arguments.get("category"))
+        finally:
+            _token_sink.reset(sink)
     elif name == "civicnav_search":
         result = await civicnav_search(
             arguments["query"],
@@ -214,23 +430,23 @@ async def call_tool(name: str, arguments: dict[str, Any]) -> list[TextContent]:
     else:
         result = {"error": f"Unknown tool: {name}"}
 
-    import json
-    return [TextContent(type="text", text=json.dumps(result, indent=2))]
+    return [TextContent(type="text", text=to_json(result, indent=2).decode())]
 
 
 # Standalone tool functions for direct use
 
 
-async def civicnav_query(query: str) -> dict[str, Any]:
+async def civicnav_query(query: str, category: str | None = None) -> dict[str, Any]:
     """Ask a question about city services.
 
     Args:
         query: Natural language question
+        category: Optional known category, which skips intent classification
 
     Returns:
-        Dict with answer, citations, intent, and latency
+        Dict with answer ID, answer, citations, intent, and latency
     """
-    return await submit_query_internal(query)
+    return await cached_submit_query(query, category)
 
 
 async def civicnav_search(
@@ -281,8 +497,27 @@ async def civicnav_feedback(
 async def main() -> None:
     """Run the MCP server."""
     logger.info("Starting CivicNav MCP server...")
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(read_stream, write_stream, server.create_initialization_options())
+
+    try:
+        # Build the shared HTTP client, agents and tools before the first tool call
+        get_http_client()
+        get_query_agent()
+        get_retrieve_agent()
+        get_answer_agent()
+        if get_settings().warmup_connections:
+            # Pay credential probing and TLS setup now rather than on the first tool call
+            await asyncio.gather(
+                get_openai_tool().check_connection(),
+                get_search_tool().check_connection(),
+            )
+
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, server.create_initialization_options())
+    finally:
+        # Same cleanup as the FastAPI lifespan
+        await get_search_tool().close()
+        await close_credential()
+        await close_http_client()
 
 
 if __name__ == "__main__":
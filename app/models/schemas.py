@@ -4,12 +4,28 @@ This module defines all data models used throughout the CivicNav application,
 including knowledge base entries, queries, search results, and agent outputs.
 """
 
+import secrets
+import time
 from datetime import datetime
 from enum import Enum
 from typing import Any, Literal
-from uuid import UUID, uuid4
+from uuid import UUID
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, field_validator
+
+
+def uuid7() -> UUID:
+    """Generate a time-ordered version 7 UUID (RFC 9562).
+
+    The leading 48 bits are the Unix timestamp in milliseconds, so IDs
+    sort by creation time and keep downstream index inserts local. The
+    random bits come from the ``secrets`` CSPRNG, which nothing can reseed,
+    so IDs from the same millisecond stay distinct.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | secrets.randbits(80)
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return UUID(int=value)
 
 
 class Category(str, Enum):
@@ -21,6 +37,7 @@ class Category(str, Enum):
     PERMIT = "permit"
     EMERGENCY = "emergency"
     GENERAL = "general"
+    GREETING = "greeting"
 
 
 class EntityType(str, Enum):
@@ -35,6 +52,8 @@ class EntityType(str, Enum):
 class Entity(BaseModel):
     """An extracted entity from a user query."""
 
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     type: EntityType
     value: str
     start_pos: int | None = None
@@ -44,13 +63,14 @@ class Entity(BaseModel):
 class KnowledgeBaseEntry(BaseModel):
     """A unit of city services information stored in Azure AI Search."""
 
-    id: str = Field(default_factory=lambda: str(uuid4()))
+    id: str = Field(default_factory=lambda: str(uuid7()))
     title: str = Field(..., min_length=1, max_length=200)
     content: str = Field(..., min_length=50, max_length=10000)
     category: Category
     service_type: str
     department: str
     updated_date: datetime
+    is_canonical: bool = False  # Curated FAQ answer that can be returned verbatim
 
     @field_validator("title")
     @classmethod
@@ -61,8 +81,11 @@ class KnowledgeBaseEntry(BaseModel):
 
     @field_validator("updated_date")
     @classmethod
-    def date_not_future(cls, v: datetime) -> datetime:
-        if v > datetime.now():
+    def date_not_future(cls, v: datetime, info: ValidationInfo) -> datetime:
+        # Bulk loaders pass a captured "now" in the validation context so
+        # the clock is read once per batch rather than once per entry.
+        now = info.context.get("now") if info.context else None
+        if v > (now or datetime.now()):
             raise ValueError("updated_date cannot be in the future")
         return v
 
@@ -70,7 +93,7 @@ class KnowledgeBaseEntry(BaseModel):
 class UserQuery(BaseModel):
     """A natural language question submitted by a user."""
 
-    id: str = Field(default_factory=lambda: str(uuid4()))
+    id: str = Field(default_factory=lambda: str(uuid7()))
     text: str = Field(..., min_length=3, max_length=1000)
     timestamp: datetime = Field(default_factory=datetime.now)
     session_id: str | None = None
@@ -86,6 +109,8 @@ class UserQuery(BaseModel):
 class IntentClassification(BaseModel):
     """Result of intent classification by QueryAgent."""
 
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     category: Category
     confidence: float = Field(..., ge=0.0, le=1.0)
     entities: list[Entity] = Field(default_factory=list)
@@ -95,10 +120,21 @@ class IntentClassification(BaseModel):
         """Check if classification confidence is below threshold."""
         return self.confidence < 0.5
 
+    @property
+    def is_out_of_scope(self) -> bool:
+        """Check if the query is small talk that needs no retrieval or synthesis."""
+        return self.category == Category.GREETING or (
+            self.category == Category.GENERAL
+            and self.confidence > 0.9
+            and not self.entities
+        )
+
 
 class SearchResult(BaseModel):
     """A single result from Azure AI Search."""
 
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     id: str
     entry_id: str
     title: str
@@ -108,11 +144,14 @@ class SearchResult(BaseModel):
     department: str | None = None
     relevance_score: float = Field(..., ge=0.0, le=1.0)
     highlight: str | None = None
+    is_canonical: bool = False
 
 
 class Citation(BaseModel):
     """A source reference included in system responses."""
 
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     entry_id: str
     title: str
     snippet: str
@@ -130,7 +169,7 @@ class AgentResult(BaseModel):
 class ChatMessage(BaseModel):
     """A message in the chat interface."""
 
-    id: str = Field(default_factory=lambda: str(uuid4()))
+    id: str = Field(default_factory=lambda: str(uuid7()))
     text: str
     sender: Literal["user", "system"]
     timestamp: datetime = Field(default_factory=datetime.now)
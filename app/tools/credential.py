@@ -0,0 +1,32 @@
+"""Shared Azure credential for CivicNav tools.
+
+A single ``DefaultAzureCredential`` is reused by every tool so that
+credential discovery (managed identity probing, Azure CLI subprocesses)
+runs once and all tools draw from the same token cache.
+"""
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from azure.identity.aio import DefaultAzureCredential
+
+# Global instance for convenience
+_credential: "DefaultAzureCredential | None" = None
+
+
+def get_credential() -> "DefaultAzureCredential":
+    """Get the global shared Azure credential, creating it if needed."""
+    global _credential
+    if _credential is None:
+        from azure.identity.aio import DefaultAzureCredential
+
+        _credential = DefaultAzureCredential()
+    return _credential
+
+
+async def close_credential() -> None:
+    """Close the global shared Azure credential, if one was created."""
+    global _credential
+    if _credential is not None:
+        await _credential.close()
+        _credential = None
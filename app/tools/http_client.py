@@ -0,0 +1,32 @@
+"""Shared HTTP client for CivicNav tools.
+
+A single pooled ``httpx.AsyncClient`` is reused by every tool so that
+TLS/TCP connections survive across pipeline stages and requests.
+HTTP/2 lets concurrent calls to the same host multiplex over one
+connection.
+"""
+
+import httpx
+
+# Global instance for convenience
+_http_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the global shared HTTP client, creating it if needed."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=100, max_connections=200),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the global shared HTTP client, if one was created."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -6,43 +6,122 @@ Includes demo mode for testing without Azure resources.
 Supports Ollama/Foundry Local for local LLM inference.
 """
 
+import asyncio
 import json
 import logging
 import random
-from typing import Any, TYPE_CHECKING
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, TYPE_CHECKING
 
 import httpx
 
+from app.cache import get_embedding_store
 from app.config import get_settings
+from app.tools.credential import get_credential
+from app.tools.http_client import get_http_client
 
 if TYPE_CHECKING:
-    from azure.identity import DefaultAzureCredential, get_bearer_token_provider
     from openai import AsyncAzureOpenAI
 
 logger = logging.getLogger(__name__)
 
+# Small-talk phrases the demo classifier treats as greetings
+DEMO_GREETINGS = frozenset({
+    "hi", "hello", "hey", "good morning", "good afternoon", "good evening",
+    "thanks", "thank you", "thanks a lot", "bye", "goodbye",
+})
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent single-text embedding requests into batch calls.
+
+    Requests queue up for at most ``max_wait`` seconds, or until
+    ``max_batch`` texts are waiting, and are then sent as one batch.
+    """
+
+    def __init__(
+        self,
+        embed_batch: Callable[[list[str]], Awaitable[list[list[float]]]],
+        max_batch: int = 64,
+        max_wait: float = 0.005,
+    ) -> None:
+        """Initialize the batcher.
+
+        Args:
+            embed_batch: Coroutine function embedding a list of texts
+            max_batch: Flush as soon as this many texts are waiting
+            max_wait: Longest time in seconds a text waits for a batch
+        """
+        self._embed_batch = embed_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, text: str) -> list[float]:
+        """Queue a text for the next batch and wait for its embedding."""
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Send every waiting text as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        """Embed a batch and resolve the waiting futures."""
+        try:
+            vectors = await self._embed_batch([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
 
 class DemoOpenAITool:
     """OpenAI tool for demo mode with OpenAI API and Ollama/Foundry Local support."""
 
-    def __init__(self) -> None:
+    def __init__(self, http_client: httpx.AsyncClient | None = None) -> None:
+        """Initialize the demo tool.
+
+        Args:
+            http_client: Optional HTTP client to use instead of the shared one
+        """
         self.settings = get_settings()
-        self._http_client: httpx.AsyncClient | None = None
+        self._http_client = http_client
         self._openai_client: Any | None = None
 
     @property
     def http_client(self) -> httpx.AsyncClient:
-        """Get or create HTTP client for Ollama requests."""
-        if self._http_client is None:
-            self._http_client = httpx.AsyncClient(timeout=120.0)
-        return self._http_client
+        """Get the HTTP client used for Ollama and OpenAI requests."""
+        return self._http_client or get_http_client()
 
     @property
     def openai_client(self):
         """Get or create the OpenAI client."""
         if self._openai_client is None and self.settings.openai_api_key:
             from openai import AsyncOpenAI
-            self._openai_client = AsyncOpenAI(api_key=self.settings.openai_api_key)
+            self._openai_client = AsyncOpenAI(
+                api_key=self.settings.openai_api_key,
+                http_client=self.http_client,
+            )
         return self._openai_client
 
     async def chat_completion(
@@ -51,6 +130,7 @@ class DemoOpenAITool:
         temperature: float = 0.7,
         max_tokens: int = 1000,
         response_format: dict[str, Any] | None = None,
+        model: str | None = None,
     ) -> str:
         """Generate chat completion using OpenAI, Ollama, or mock responses."""
         user_message = messages[-1].get("content", "") if messages else ""
@@ -65,7 +145,7 @@ class DemoOpenAITool:
         # Try OpenAI API first if enabled
         if self.settings.use_openai and self.settings.openai_api_key:
             try:
-                return await self._openai_chat_completion(messages, temperature, max_tokens, is_json_request)
+                return await self._openai_chat_completion(messages, temperature, max_tokens, is_json_request, model)
             except Exception as e:
                 logger.warning(f"OpenAI API request failed, falling back: {e}")
 
@@ -82,18 +162,57 @@ class DemoOpenAITool:
             return self._generate_demo_classification(user_message)
         return self._generate_demo_answer(user_message)
 
+    async def chat_completion_stream(
+        self,
+        messages: list[dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        model: str | None = None,
+    ) -> AsyncIterator[str]:
+        """Stream a chat completion using OpenAI, or yield the buffered fallback.
+
+        The fallback only applies if OpenAI fails before the first token;
+        later failures are re-raised rather than appending a second answer.
+        """
+        if self.settings.use_openai and self.settings.openai_api_key:
+            model = model or self.settings.openai_model
+            streamed = False
+            try:
+                logger.info(f"[OPENAI] Streaming chat completion with model {model}")
+                stream = await self.openai_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True,
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        streamed = True
+                        yield chunk.choices[0].delta.content
+                return
+            except Exception as e:
+                if streamed:
+                    raise
+                logger.warning(f"OpenAI streaming request failed, falling back: {e}")
+
+        # Ollama and mock responses are returned as a single chunk
+        yield await self.chat_completion(messages, temperature, max_tokens, model=model)
+
     async def _openai_chat_completion(
         self,
         messages: list[dict[str, str]],
         temperature: float,
         max_tokens: int,
         is_json_request: bool,
+        model: str | None = None,
     ) -> str:
         """Call OpenAI's chat completions API."""
-        logger.info(f"[OPENAI] Chat completion with model {self.settings.openai_model}")
+        model = model or self.settings.openai_model
+        logger.info(f"[OPENAI] Chat completion with model {model}")
 
         kwargs: dict[str, Any] = {
-            "model": self.settings.openai_model,
+            "model": model,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens,
@@ -131,7 +250,8 @@ class DemoOpenAITool:
             payload["format"] = "json"
 
         url = f"{self.settings.ollama_endpoint}/v1/chat/completions"
-        response = await self.http_client.post(url, json=payload)
+        # Local models can be slow to load, so allow longer than the shared default
+        response = await self.http_client.post(url, json=payload, timeout=120.0)
         response.raise_for_status()
 
         data = response.json()
@@ -142,9 +262,13 @@ class DemoOpenAITool:
     def _generate_demo_classification(self, prompt: str) -> str:
         """Generate a mock intent classification JSON."""
         prompt_lower = prompt.lower()
+        query_lower = prompt_lower.rsplit("user query:", 1)[-1].strip(" \n?!.")
 
         # Detect category from context
-        if "trash" in prompt_lower or "garbage" in prompt_lower or "recycling" in prompt_lower:
+        if query_lower in DEMO_GREETINGS:
+            category = "greeting"
+            entities = []
+        elif "trash" in prompt_lower or "garbage" in prompt_lower or "recycling" in prompt_lower:
             category = "schedule"
             entities = [{"type": "service_type", "value": "trash collection", "start_pos": 0, "end_pos": 5}]
         elif "permit" in prompt_lower or "building" in prompt_lower or "license" in prompt_lower:
@@ -211,9 +335,18 @@ class DemoOpenAITool:
     async def create_embedding(self, text: str) -> list[float]:
         """Create mock embedding for demo mode."""
         logger.info("[DEMO MODE] Generating mock embedding")
-        # Return a consistent mock embedding
-        random.seed(hash(text) % 2**32)
-        return [random.uniform(-1, 1) for _ in range(1536)]
+        return self._mock_embedding(text)
+
+    async def create_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """Create mock embeddings for a batch of texts in demo mode."""
+        logger.info(f"[DEMO MODE] Generating {len(texts)} mock embeddings")
+        return [self._mock_embedding(text) for text in texts]
+
+    @staticmethod
+    def _mock_embedding(text: str) -> list[float]:
+        """Return a consistent mock embedding for the given text."""
+        rng = random.Random(hash(text) % 2**32)
+        return [rng.uniform(-1, 1) for _ in range(1536)]
 
     async def check_connection(self) -> bool:
         """Check if OpenAI/Ollama is accessible, or return True for mock mode."""
@@ -251,14 +384,24 @@ class OpenAITool:
     local development (Azure CLI) and production (managed identity).
     """
 
-    def __init__(self) -> None:
-        """Initialize the OpenAI tool with Azure credentials."""
-        from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+    def __init__(self, http_client: httpx.AsyncClient | None = None) -> None:
+        """Initialize the OpenAI tool with Azure credentials.
+
+        Args:
+            http_client: Optional HTTP client to use instead of the shared one
+        """
+        from azure.identity.aio import get_bearer_token_provider
         from openai import AsyncAzureOpenAI
 
         self.settings = get_settings()
         self._client: AsyncAzureOpenAI | None = None
-        self._DefaultAzureCredential = DefaultAzureCredential
+        self._http_client = http_client
+        self.embedding_store = get_embedding_store()
+        self._batcher = EmbeddingBatcher(
+            self.create_embeddings,
+            max_batch=self.settings.embedding_batch_size,
+            max_wait=self.settings.embedding_batch_wait_ms / 1000,
+        )
         self._get_bearer_token_provider = get_bearer_token_provider
         self._AsyncAzureOpenAI = AsyncAzureOpenAI
 
@@ -266,14 +409,14 @@ class OpenAITool:
     def client(self):
         """Get or create the AsyncAzureOpenAI client."""
         if self._client is None:
-            credential = self._DefaultAzureCredential()
             token_provider = self._get_bearer_token_provider(
-                credential, "https://cognitiveservices.azure.com/.default"
+                get_credential(), "https://cognitiveservices.azure.com/.default"
             )
             self._client = self._AsyncAzureOpenAI(
                 azure_endpoint=self.settings.azure_openai_endpoint,
                 azure_ad_token_provider=token_provider,
                 api_version=self.settings.azure_openai_api_version,
+                http_client=self._http_client or get_http_client(),
             )
         return self._client
 
@@ -283,6 +426,7 @@ class OpenAITool:
         temperature: float = 0.7,
         max_tokens: int = 1000,
         response_format: dict[str, Any] | None = None,
+        model: str | None = None,
     ) -> str:
         """Generate a chat completion using Azure OpenAI.
 
@@ -291,6 +435,7 @@ class OpenAITool:
             temperature: Sampling temperature (0.0-2.0)
             max_tokens: Maximum tokens in response
             response_format: Optional response format specification
+            model: Deployment name, defaulting to the chat deployment
 
         Returns:
             The assistant's response text
@@ -298,7 +443,7 @@ class OpenAITool:
         logger.debug(f"Chat completion with {len(messages)} messages")
 
         kwargs: dict[str, Any] = {
-            "model": self.settings.azure_openai_chat_deployment,
+            "model": model or self.settings.azure_openai_chat_deployment,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens,
@@ -313,25 +458,85 @@ class OpenAITool:
         logger.debug(f"Chat completion response: {len(content)} chars")
         return content
 
+    async def chat_completion_stream(
+        self,
+        messages: list[dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        model: str | None = None,
+    ) -> AsyncIterator[str]:
+        """Stream a chat completion from Azure OpenAI token by token.
+
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            temperature: Sampling temperature (0.0-2.0)
+            max_tokens: Maximum tokens in response
+            model: Deployment name, defaulting to the chat deployment
+
+        Yields:
+            Content deltas as they arrive from the service
+        """
+        logger.debug(f"Streaming chat completion with {len(messages)} messages")
+
+        stream = await self.client.chat.completions.create(
+            model=model or self.settings.azure_openai_chat_deployment,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
     async def create_embedding(self, text: str) -> list[float]:
         """Create an embedding vector for the given text.
 
+        Concurrent calls are coalesced into a single batch request.
+
         Args:
             text: The text to embed
 
         Returns:
             List of floats representing the embedding vector
         """
-        logger.debug(f"Creating embedding for text: {len(text)} chars")
+        return await self._batcher.submit(text)
 
-        response = await self.client.embeddings.create(
-            model=self.settings.azure_openai_embedding_deployment,
-            input=text,
-        )
+    async def create_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """Create embedding vectors for several texts in one request.
+
+        Texts already in the embedding store are served from it, and
+        duplicate inputs are sent to the service only once.
 
-        embedding = response.data[0].embedding
-        logger.debug(f"Created embedding with {len(embedding)} dimensions")
-        return embedding
+        Args:
+            texts: The texts to embed
+
+        Returns:
+            List of embedding vectors in the same order as texts
+        """
+        if not texts:
+            return []
+
+        model = self.settings.azure_openai_embedding_deployment
+        keys = [self.embedding_store.key(model, text) for text in texts]
+        vectors = await asyncio.to_thread(self.embedding_store.get_many, set(keys))
+        missing = {key: text for key, text in zip(keys, texts) if vectors[key] is None}
+
+        if missing:
+            logger.debug(f"Creating {len(missing)} embeddings in one request")
+            response = await self.client.embeddings.create(
+                model=model,
+                input=list(missing.values()),
+            )
+            created = dict(zip(
+                missing,
+                (item.embedding for item in sorted(response.data, key=lambda d: d.index)),
+            ))
+            await asyncio.to_thread(self.embedding_store.put_many, created)
+            vectors.update(created)
+
+        return [vectors[key] for key in keys]
 
     async def check_connection(self) -> bool:
         """Check if the OpenAI service is accessible.
@@ -351,21 +556,14 @@ class OpenAITool:
             return False
 
 
-# Global instance for convenience
-_openai_tool: OpenAITool | DemoOpenAITool | None = None
-
-
+@lru_cache(maxsize=1)
 def get_openai_tool() -> OpenAITool | DemoOpenAITool:
     """Get the global OpenAI tool instance.
 
     Returns DemoOpenAITool if demo_mode is enabled or Azure is not configured.
     """
-    global _openai_tool
-    if _openai_tool is None:
-        settings = get_settings()
-        if settings.demo_mode or not settings.is_configured:
-            logger.info("Using DemoOpenAITool (demo mode or Azure not configured)")
-            _openai_tool = DemoOpenAITool()
-        else:
-            _openai_tool = OpenAITool()
-    return _openai_tool
+    settings = get_settings()
+    if settings.demo_mode or not settings.is_configured:
+        logger.info("Using DemoOpenAITool (demo mode or Azure not configured)")
+        return DemoOpenAITool()
+    return OpenAITool()
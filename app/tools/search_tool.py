@@ -7,14 +7,26 @@ Includes demo mode for testing without Azure resources.
 
 import json
 import logging
+import time
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator
 
 from app.config import get_settings
 from app.models.schemas import Category, SearchResult
+from app.tools.credential import get_credential
 
 logger = logging.getLogger(__name__)
 
+# OData filter for each category, built once rather than per search
+_CATEGORY_FILTER: dict[Category, str] = {c: f"category eq '{c.value}'" for c in Category}
+
+# Index fields selected for every search; SearchResult needs all of them
+_RESULT_FIELDS = ["id", "title", "content", "category", "service_type", "department", "is_canonical"]
+
+# Fields for indexes built before is_canonical was added to the schema
+_LEGACY_RESULT_FIELDS = [f for f in _RESULT_FIELDS if f != "is_canonical"]
+
 
 class DemoSearchTool:
     """Mock Search tool for demo mode using local knowledge base."""
@@ -65,6 +77,27 @@ class DemoSearchTool:
         logger.info(f"[DEMO MODE] Keyword search: '{query}'")
         return await self._search(query, top_k, category)
 
+    async def hybrid_search_iter(
+        self,
+        query: str,
+        vector: list[float],
+        top_k: int = 5,
+        category: Category | None = None,
+    ) -> AsyncIterator[SearchResult]:
+        """Yield mock hybrid search results one at a time."""
+        for result in await self.hybrid_search(query, vector, top_k, category):
+            yield result
+
+    async def keyword_search_iter(
+        self,
+        query: str,
+        top_k: int = 5,
+        category: Category | None = None,
+    ) -> AsyncIterator[SearchResult]:
+        """Yield mock keyword search results one at a time."""
+        for result in await self.keyword_search(query, top_k, category):
+            yield result
+
     async def _search(
         self,
         query: str,
@@ -97,29 +130,31 @@ class DemoSearchTool:
         results.sort(key=lambda x: x[0], reverse=True)
         top_results = results[:top_k]
 
-        search_results: list[SearchResult] = []
-        for score, entry in top_results:
-            # Create highlight snippet
-            content = entry.get("content", "")
-            highlight = content[:200] + "..." if len(content) > 200 else content
-
-            search_results.append(
-                SearchResult(
-                    id=entry.get("id", ""),
-                    entry_id=entry.get("id", ""),
-                    title=entry.get("title", ""),
-                    content=content,
-                    category=Category(entry.get("category", "general")),
-                    service_type=entry.get("service_type"),
-                    department=entry.get("department"),
-                    relevance_score=min(score / len(query_terms), 1.0) if query_terms else 0.5,
-                    highlight=highlight,
-                )
-            )
+        search_results = [self._entry_to_result(entry, score, query_terms) for score, entry in top_results]
 
         logger.info(f"[DEMO MODE] Found {len(search_results)} results")
         return search_results
 
+    @staticmethod
+    def _entry_to_result(entry: dict, score: float, query_terms: list[str]) -> SearchResult:
+        """Convert a knowledge base entry and its match score into a SearchResult."""
+        # Create highlight snippet
+        content = entry.get("content", "")
+        highlight = content[:200] + "..." if len(content) > 200 else content
+
+        return SearchResult(
+            id=entry.get("id", ""),
+            entry_id=entry.get("id", ""),
+            title=entry.get("title", ""),
+            content=content,
+            category=Category(entry.get("category", "general")),
+            service_type=entry.get("service_type"),
+            department=entry.get("department"),
+            relevance_score=min(score / len(query_terms), 1.0) if query_terms else 0.5,
+            highlight=highlight,
+            is_canonical=entry.get("is_canonical", False),
+        )
+
     async def get_categories(self) -> dict[str, int]:
         """Get count of entries per category from local knowledge base."""
         logger.info("[DEMO MODE] Getting category counts")
@@ -133,6 +168,9 @@ class DemoSearchTool:
         """Demo mode is always 'connected'."""
         return True
 
+    async def close(self) -> None:
+        """Demo mode holds no connections."""
+
 
 class SearchTool:
     """Wrapper for Azure AI Search operations.
@@ -143,29 +181,39 @@ class SearchTool:
 
     def __init__(self) -> None:
         """Initialize the Search tool with Azure credentials."""
-        from azure.identity import DefaultAzureCredential
-        from azure.search.documents import SearchClient
+        from azure.core.exceptions import HttpResponseError
+        from azure.search.documents.aio import SearchClient
         from azure.search.documents.models import QueryType, VectorizedQuery
 
         self.settings = get_settings()
         self._client = None
-        self._DefaultAzureCredential = DefaultAzureCredential
+        self._category_cache: tuple[float, dict[str, int]] | None = None
+        self._result_fields = _RESULT_FIELDS
+        self._HttpResponseError = HttpResponseError
         self._SearchClient = SearchClient
         self._QueryType = QueryType
         self._VectorizedQuery = VectorizedQuery
 
     @property
     def client(self):
-        """Get or create the SearchClient."""
+        """Get or create the async SearchClient."""
         if self._client is None:
-            credential = self._DefaultAzureCredential()
             self._client = self._SearchClient(
                 endpoint=self.settings.azure_search_endpoint,
                 index_name=self.settings.azure_search_index,
-                credential=credential,
+                credential=get_credential(),
             )
         return self._client
 
+    async def close(self) -> None:
+        """Close the SearchClient, if it was created.
+
+        The shared credential is closed separately by ``close_credential``.
+        """
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
     async def hybrid_search(
         self,
         query: str,
@@ -184,10 +232,36 @@ class SearchTool:
         Returns:
             List of SearchResult objects sorted by relevance
         """
+        search_results = [
+            result async for result in self.hybrid_search_iter(query, vector, top_k, category)
+        ]
+        logger.debug(f"Found {len(search_results)} results")
+        return search_results
+
+    async def hybrid_search_iter(
+        self,
+        query: str,
+        vector: list[float],
+        top_k: int = 5,
+        category: Category | None = None,
+    ) -> AsyncIterator[SearchResult]:
+        """Stream hybrid search results as the pager delivers them.
+
+        Callers that stop early skip building the remaining results.
+
+        Args:
+            query: The search query text
+            vector: The embedding vector for vector search
+            top_k: Number of results to return
+            category: Optional category filter
+
+        Yields:
+            SearchResult objects in relevance order
+        """
         logger.debug(f"Hybrid search: '{query}' (top_k={top_k})")
 
         # Build filter if category specified
-        filter_expr = f"category eq '{category.value}'" if category else None
+        filter_expr = _CATEGORY_FILTER.get(category)
 
         # Create vector query
         vector_query = self._VectorizedQuery(
@@ -197,39 +271,18 @@ class SearchTool:
         )
 
         # Execute hybrid search with semantic ranking
-        results = self.client.search(
+        rows = self._search_rows(
             search_text=query,
             vector_queries=[vector_query],
             query_type=self._QueryType.SEMANTIC,
             semantic_configuration_name="default",
             top=top_k,
             filter=filter_expr,
-            select=["id", "title", "content", "category", "service_type", "department"],
             highlight_fields="content",
         )
 
-        search_results: list[SearchResult] = []
-        for result in results:
-            # Get highlight if available
-            highlights = result.get("@search.highlights", {})
-            highlight = highlights.get("content", [""])[0] if highlights else None
-
-            search_results.append(
-                SearchResult(
-                    id=result["id"],
-                    entry_id=result["id"],
-                    title=result["title"],
-                    content=result["content"],
-                    category=Category(result["category"]),
-                    service_type=result.get("service_type"),
-                    department=result.get("department"),
-                    relevance_score=result.get("@search.score", 0.0),
-                    highlight=highlight,
-                )
-            )
-
-        logger.debug(f"Found {len(search_results)} results")
-        return search_results
+        async for row in rows:
+            yield self._row_to_result(row)
 
     async def keyword_search(
         self,
@@ -247,61 +300,150 @@ class SearchTool:
         Returns:
             List of SearchResult objects sorted by relevance
         """
+        return [result async for result in self.keyword_search_iter(query, top_k, category)]
+
+    async def keyword_search_iter(
+        self,
+        query: str,
+        top_k: int = 5,
+        category: Category | None = None,
+    ) -> AsyncIterator[SearchResult]:
+        """Stream keyword-only search results as the pager delivers them.
+
+        Args:
+            query: The search query text
+            top_k: Number of results to return
+            category: Optional category filter
+
+        Yields:
+            SearchResult objects in relevance order
+        """
         logger.debug(f"Keyword search: '{query}' (top_k={top_k})")
 
-        filter_expr = f"category eq '{category.value}'" if category else None
+        filter_expr = _CATEGORY_FILTER.get(category)
 
-        results = self.client.search(
+        rows = self._search_rows(
             search_text=query,
             top=top_k,
             filter=filter_expr,
-            select=["id", "title", "content", "category", "service_type", "department"],
             highlight_fields="content",
         )
 
-        search_results: list[SearchResult] = []
-        for result in results:
-            highlights = result.get("@search.highlights", {})
-            highlight = highlights.get("content", [""])[0] if highlights else None
-
-            search_results.append(
-                SearchResult(
-                    id=result["id"],
-                    entry_id=result["id"],
-                    title=result["title"],
-                    content=result["content"],
-                    category=Category(result["category"]),
-                    service_type=result.get("service_type"),
-                    department=result.get("department"),
-                    relevance_score=result.get("@search.score", 0.0),
-                    highlight=highlight,
-                )
+        async for row in rows:
+            yield self._row_to_result(row)
+
+    async def _search_rows(self, **search_kwargs: Any) -> AsyncIterator[dict[str, Any]]:
+        """Run a search and yield its raw hits.
+
+        Indexes created before ``is_canonical`` was added reject it in
+        ``select`` with a 400. The field list then drops it for the life of
+        the tool, so searches keep working (without the FAQ fast path)
+        until ``setup_index.py`` rebuilds the index.
+
+        Args:
+            **search_kwargs: SearchClient.search arguments other than select
+
+        Yields:
+            Documents from the search pager in relevance order
+        """
+        select = self._result_fields
+        results = await self.client.search(select=select, **search_kwargs)
+
+        yielded = False
+        try:
+            async for row in results:
+                yielded = True
+                yield row
+        except self._HttpResponseError as e:
+            if yielded or e.status_code != 400 or select is _LEGACY_RESULT_FIELDS:
+                raise
+            logger.warning(
+                "Search index has no is_canonical field; re-run setup_index.py to enable the FAQ fast path"
             )
+            self._result_fields = _LEGACY_RESULT_FIELDS
+            async for row in self._search_rows(**search_kwargs):
+                yield row
 
-        return search_results
+    def _row_to_result(self, row: dict[str, Any]) -> SearchResult:
+        """Convert one search hit into a SearchResult.
+
+        Validation is skipped when ``trusted_search_source`` is set, since
+        the index schema already guarantees the field types.
+
+        Args:
+            row: Document returned by the search pager
+
+        Returns:
+            The hit as a SearchResult, with its first content highlight if any
+        """
+        highlights = row.get("@search.highlights")
+        highlight = highlights.get("content", (None,))[0] if highlights else None
+
+        fields = {
+            "id": row["id"],
+            "entry_id": row["id"],
+            "title": row["title"],
+            "content": row["content"],
+            "category": Category(row["category"]),
+            "service_type": row.get("service_type"),
+            "department": row.get("department"),
+            "relevance_score": self._relevance(row),
+            "highlight": highlight,
+            "is_canonical": row.get("is_canonical", False),
+        }
+        if self.settings.trusted_search_source:
+            return SearchResult.model_construct(**fields)
+        return SearchResult(**fields)
+
+    @staticmethod
+    def _relevance(row: dict[str, Any]) -> float:
+        """Score a search hit on a 0-1 scale.
+
+        Hybrid ``@search.score`` values are reciprocal rank fusion sums (about
+        0.01-0.03) that say little about match quality, so the semantic
+        reranker score (0-4) is used whenever the ranker ran.
+
+        Args:
+            row: Document returned by the search pager
+
+        Returns:
+            The reranker score divided by 4, or the raw search score
+        """
+        reranker_score = row.get("@search.reranker_score")
+        if reranker_score is not None:
+            return min(reranker_score / 4, 1.0)
+        return row.get("@search.score", 0.0)
 
     async def get_categories(self) -> dict[str, int]:
         """Get count of entries per category.
 
+        Counts only change on ingestion, so they are cached for
+        ``categories_cache_ttl_seconds``. Ingestion runs in the separate
+        ``setup_index.py`` process, so that TTL alone bounds how stale the
+        counts can be.
+
         Returns:
             Dict mapping category name to entry count
         """
+        if self._category_cache is not None:
+            fetched_at, cached = self._category_cache
+            if time.monotonic() - fetched_at < self.settings.categories_cache_ttl_seconds:
+                return cached
+
         logger.debug("Getting category counts")
 
         # Use faceting to get category counts
-        results = self.client.search(
+        results = await self.client.search(
             search_text="*",
             top=0,
             facets=["category"],
         )
 
         # Extract facet counts
-        category_counts: dict[str, int] = {}
-        facets = results.get_facets()
-        if facets and "category" in facets:
-            for facet in facets["category"]:
-                category_counts[facet["value"]] = facet["count"]
+        facets = await results.get_facets() or {}
+        category_counts = {facet["value"]: facet["count"] for facet in facets.get("category", ())}
 
+        self._category_cache = (time.monotonic(), category_counts)
         return category_counts
 
     async def check_connection(self) -> bool:
@@ -312,28 +454,23 @@ class SearchTool:
         """
         try:
             # Simple test search
-            list(self.client.search(search_text="*", top=1))
+            results = await self.client.search(search_text="*", top=1)
+            async for _ in results:
+                break
             return True
         except Exception as e:
             logger.warning(f"Search connection check failed: {e}")
             return False
 
 
-# Global instance for convenience
-_search_tool: SearchTool | DemoSearchTool | None = None
-
-
+@lru_cache(maxsize=1)
 def get_search_tool() -> SearchTool | DemoSearchTool:
     """Get the global Search tool instance.
 
     Returns DemoSearchTool if demo_mode is enabled or Azure is not configured.
     """
-    global _search_tool
-    if _search_tool is None:
-        settings = get_settings()
-        if settings.demo_mode or not settings.is_configured:
-            logger.info("Using DemoSearchTool (demo mode or Azure not configured)")
-            _search_tool = DemoSearchTool()
-        else:
-            _search_tool = SearchTool()
-    return _search_tool
+    settings = get_settings()
+    if settings.demo_mode or not settings.is_configured:
+        logger.info("Using DemoSearchTool (demo mode or Azure not configured)")
+        return DemoSearchTool()
+    return SearchTool()
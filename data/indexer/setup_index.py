@@ -6,17 +6,32 @@ Uses DefaultAzureCredential for authentication.
 """
 
 import asyncio
+import hashlib
 import json
 import logging
 import os
 import sys
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from operator import itemgetter
 from pathlib import Path
-
-from azure.identity import DefaultAzureCredential
+from typing import Iterator
+
+import numpy as np
+import requests
+from pydantic_core import from_json
+from azure.core.exceptions import ResourceNotFoundError
+from azure.core.pipeline.transport import RequestsTransport
+from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 from azure.search.documents import SearchClient
 from azure.search.documents.indexes import SearchIndexClient
 from azure.search.documents.indexes.models import (
     HnswAlgorithmConfiguration,
+    HnswParameters,
+    RescoringOptions,
+    ScalarQuantizationCompression,
+    ScalarQuantizationParameters,
     SearchableField,
     SearchField,
     SearchFieldDataType,
@@ -27,14 +42,16 @@ from azure.search.documents.indexes.models import (
     SemanticSearch,
     SimpleField,
     VectorSearch,
+    VectorSearchAlgorithmMetric,
+    VectorSearchCompressionTarget,
     VectorSearchProfile,
 )
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from openai import AzureOpenAI
-from azure.identity import get_bearer_token_provider
+from openai import AsyncAzureOpenAI
+from app.cache import EmbeddingStore
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
@@ -45,6 +62,16 @@ INDEX_NAME = os.environ.get("AZURE_SEARCH_INDEX", "civicnav-index")
 OPENAI_ENDPOINT = os.environ.get("AZURE_OPENAI_ENDPOINT", "")
 EMBEDDING_DEPLOYMENT = os.environ.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-small")
 EMBEDDING_DIMENSIONS = 1536
+OPENAI_TOKEN_SCOPE = "https://cognitiveservices.azure.com/.default"
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_CONCURRENCY = int(os.environ.get("EMBEDDING_CONCURRENCY", "8"))
+EMBEDDING_MAX_RETRIES = 6  # The SDK backs off exponentially on 429s
+SEARCH_BATCH_SIZE = int(os.environ.get("SEARCH_BATCH_SIZE", "500"))
+SEARCH_MAX_CONCURRENT_BATCHES = int(os.environ.get("SEARCH_MAX_CONCURRENT_BATCHES", "4"))
+INDEX_STATE_PATH = Path(__file__).parent.parent / "index_state.json"
+EMBEDDING_CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH", str(Path(__file__).parent.parent / "embedding_cache.db")
+)
 
 
 def create_index_definition() -> SearchIndex:
@@ -57,6 +84,7 @@ def create_index_definition() -> SearchIndex:
         SimpleField(name="service_type", type=SearchFieldDataType.String, filterable=True),
         SimpleField(name="department", type=SearchFieldDataType.String, filterable=True),
         SimpleField(name="updated_date", type=SearchFieldDataType.DateTimeOffset, filterable=True, sortable=True),
+        SimpleField(name="is_canonical", type=SearchFieldDataType.Boolean, filterable=True),
         SearchField(
             name="content_vector",
             type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
@@ -67,8 +95,37 @@ def create_index_definition() -> SearchIndex:
     ]
 
     vector_search = VectorSearch(
-        profiles=[VectorSearchProfile(name="default", algorithm_configuration_name="hnsw")],
-        algorithms=[HnswAlgorithmConfiguration(name="hnsw")],
+        profiles=[
+            VectorSearchProfile(
+                name="default",
+                algorithm_configuration_name="hnsw",
+                compression_name="sq8",
+            )
+        ],
+        algorithms=[
+            HnswAlgorithmConfiguration(
+                name="hnsw",
+                # A denser graph than the default m=4 keeps recall high with a
+                # narrower query-time search than the default efSearch=500
+                parameters=HnswParameters(
+                    m=16,
+                    ef_construction=400,
+                    ef_search=100,
+                    metric=VectorSearchAlgorithmMetric.COSINE,
+                ),
+            )
+        ],
+        # int8 quantization shrinks the in-memory graph vectors 4x; the
+        # full-precision originals rescore the top candidates
+        compressions=[
+            ScalarQuantizationCompression(
+                compression_name="sq8",
+                parameters=ScalarQuantizationParameters(
+                    quantized_data_type=VectorSearchCompressionTarget.INT8,
+                ),
+                rescoring_options=RescoringOptions(enable_rescoring=True),
+            )
+        ],
     )
 
     semantic_config = SemanticConfiguration(
@@ -89,34 +146,182 @@ def create_index_definition() -> SearchIndex:
     )
 
 
-def get_openai_client() -> AzureOpenAI:
-    """Create Azure OpenAI client with managed identity."""
-    credential = DefaultAzureCredential()
-    token_provider = get_bearer_token_provider(
-        credential, "https://cognitiveservices.azure.com/.default"
-    )
-    return AzureOpenAI(
+def ensure_index(index_client: SearchIndexClient) -> None:
+    """Create or update the index unless its definition is unchanged.
+
+    The hash of the last definition pushed to each endpoint/index is kept in
+    INDEX_STATE_PATH; a matching hash skips the update as long as the index
+    still exists.
+    """
+    definition = create_index_definition()
+    definition_hash = hashlib.sha256(
+        json.dumps(definition.as_dict(), sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    state = json.loads(INDEX_STATE_PATH.read_text()) if INDEX_STATE_PATH.exists() else {}
+    state_key = f"{SEARCH_ENDPOINT}/{INDEX_NAME}"
+
+    if state.get(state_key) == definition_hash:
+        try:
+            index_client.get_index(INDEX_NAME)
+            logger.info(f"Index '{INDEX_NAME}' definition unchanged, skipping update")
+            return
+        except ResourceNotFoundError:
+            logger.info(f"Index '{INDEX_NAME}' no longer exists, recreating")
+
+    index_client.create_or_update_index(definition)
+    state[state_key] = definition_hash
+    INDEX_STATE_PATH.write_text(json.dumps(state, indent=2))
+    logger.info(f"Index '{INDEX_NAME}' created/updated successfully")
+
+
+def get_openai_client(credential: DefaultAzureCredential) -> AsyncAzureOpenAI:
+    """Create async Azure OpenAI client with managed identity.
+
+    The token provider wraps the script's shared credential, so tokens are
+    fetched once and cached for every client.
+    """
+    token_provider = get_bearer_token_provider(credential, OPENAI_TOKEN_SCOPE)
+    return AsyncAzureOpenAI(
         azure_endpoint=OPENAI_ENDPOINT,
         azure_ad_token_provider=token_provider,
         api_version="2024-02-15-preview",
+        max_retries=EMBEDDING_MAX_RETRIES,
+    )
+
+
+async def create_embeddings_batch(
+    client: AsyncAzureOpenAI,
+    semaphore: asyncio.Semaphore,
+    texts: list[str],
+) -> np.ndarray:
+    """Create embeddings for several texts in a single request.
+
+    Returns a float32 array with one row per input text, in input order,
+    matching the index's Collection(Edm.Single) vector field.
+    """
+    async with semaphore:
+        response = await client.embeddings.create(
+            model=EMBEDDING_DEPLOYMENT,
+            input=texts,
+        )
+    return np.array(
+        [item.embedding for item in sorted(response.data, key=lambda item: item.index)],
+        dtype=np.float32,
     )
 
 
-def create_embedding(client: AzureOpenAI, text: str) -> list[float]:
-    """Create an embedding for the given text."""
-    response = client.embeddings.create(
-        model=EMBEDDING_DEPLOYMENT,
-        input=text,
+async def embed_texts(texts: list[str], credential: DefaultAzureCredential) -> list[np.ndarray]:
+    """Embed texts in batches, with up to EMBEDDING_CONCURRENCY requests in flight."""
+    async with get_openai_client(credential) as client:
+        semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+        batches = await asyncio.gather(*(
+            create_embeddings_batch(client, semaphore, texts[start:start + EMBEDDING_BATCH_SIZE])
+            for start in range(0, len(texts), EMBEDDING_BATCH_SIZE)
+        ))
+    return [embedding for batch in batches for embedding in batch]
+
+
+def get_or_compute_embeddings(
+    texts: list[str],
+    credential: DefaultAzureCredential,
+    store: EmbeddingStore,
+) -> dict[str, np.ndarray]:
+    """Embed texts, reusing vectors cached on disk from earlier runs.
+
+    Only texts whose model/content hash is not yet cached are sent to the
+    embeddings API; the new vectors are then written back to the cache.
+    """
+    keys = {text: EmbeddingStore.key(EMBEDDING_DEPLOYMENT, text) for text in texts}
+    cached = store.get_many(set(keys.values()))
+    embeddings: dict[str, np.ndarray] = {
+        text: np.asarray(cached[key], dtype=np.float32)
+        for text, key in keys.items()
+        if cached[key] is not None
+    }
+
+    uncached = [text for text in texts if text not in embeddings]
+    logger.debug(f"{len(texts) - len(uncached)} embeddings cached, {len(uncached)} to compute")
+    if uncached:
+        computed = asyncio.run(embed_texts(uncached, credential))
+        embeddings.update(zip(uncached, computed))
+        store.put_many({keys[text]: embedding for text, embedding in zip(uncached, computed)})
+    return embeddings
+
+
+# Entry fields copied verbatim into each index document
+DOCUMENT_FIELDS = (
+    "id",
+    "title",
+    "content",
+    "category",
+    "service_type",
+    "department",
+    "updated_date",
+)
+_document_fields = itemgetter(*DOCUMENT_FIELDS)
+
+
+def build_documents(
+    entries: list[dict],
+    credential: DefaultAzureCredential,
+    store: EmbeddingStore,
+) -> list[dict]:
+    """Embed a batch of entries and turn them into index documents."""
+    # Combine title and content for embedding
+    texts_to_embed = [f"{entry['title']}\n\n{entry['content']}" for entry in entries]
+
+    # Embed each distinct text once and fan the vector back out to duplicates
+    unique_texts = list(dict.fromkeys(texts_to_embed))
+    embedding_by_text = get_or_compute_embeddings(unique_texts, credential, store)
+
+    return [
+        dict(
+            zip(DOCUMENT_FIELDS, _document_fields(entry)),
+            is_canonical=entry.get("is_canonical", False),
+            content_vector=embedding_by_text[text],
+        )
+        for entry, text in zip(entries, texts_to_embed)
+    ]
+
+
+def upload_batch(search_client: SearchClient, documents: list[dict]) -> list:
+    """Upload one batch, realizing its float32 vectors as JSON-ready lists."""
+    return search_client.upload_documents(
+        [{**doc, "content_vector": doc["content_vector"].tolist()} for doc in documents]
     )
-    return response.data[0].embedding
 
 
-def load_knowledge_base() -> list[dict]:
-    """Load knowledge base entries from JSON file."""
+def iter_knowledge_base() -> Iterator[dict]:
+    """Yield knowledge base entries from the JSON file one at a time.
+
+    Uses the optional ijson streaming parser when installed, so memory
+    stays flat for large files; otherwise parses the whole file at once
+    with pydantic-core's Rust JSON parser.
+    """
     kb_path = Path(__file__).parent.parent / "knowledge_base.json"
-    with open(kb_path) as f:
-        data = json.load(f)
-    return data["entries"]
+    try:
+        import ijson
+    except ImportError:
+        yield from from_json(kb_path.read_bytes())["entries"]
+        return
+
+    with open(kb_path, "rb") as f:
+        yield from ijson.items(f, "entries.item", use_float=True)
+
+
+def iter_batches(entries: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    """Group a stream of entries into lists of at most size entries."""
+    while batch := list(islice(entries, size)):
+        yield batch
+
+
+def wait_for_index(index_ready: Future) -> None:
+    """Block until the index is ready, exiting if creation failed."""
+    try:
+        index_ready.result()
+    except Exception as e:
+        logger.error(f"Failed to create index: {e}")
+        sys.exit(1)
 
 
 def main() -> None:
@@ -127,69 +332,59 @@ def main() -> None:
         logger.error("AZURE_SEARCH_ENDPOINT and AZURE_OPENAI_ENDPOINT must be set")
         sys.exit(1)
 
+    # One credential and one pooled HTTP session serve every client
     credential = DefaultAzureCredential()
+    session = requests.Session()
+    transport = RequestsTransport(session=session, session_owner=False, connection_timeout=30)
 
-    # Create or update index
-    logger.info(f"Creating/updating index: {INDEX_NAME}")
-    index_client = SearchIndexClient(endpoint=SEARCH_ENDPOINT, credential=credential)
-    index_definition = create_index_definition()
-
-    try:
-        index_client.create_or_update_index(index_definition)
-        logger.info(f"Index '{INDEX_NAME}' created/updated successfully")
-    except Exception as e:
-        logger.error(f"Failed to create index: {e}")
-        sys.exit(1)
-
-    # Load knowledge base
-    logger.info("Loading knowledge base...")
-    entries = load_knowledge_base()
-    logger.info(f"Loaded {len(entries)} entries")
-
-    # Create OpenAI client for embeddings
-    logger.info("Initializing OpenAI client...")
-    openai_client = get_openai_client()
-
-    # Generate embeddings and prepare documents
-    logger.info("Generating embeddings...")
-    documents = []
-    for i, entry in enumerate(entries):
-        # Combine title and content for embedding
-        text_to_embed = f"{entry['title']}\n\n{entry['content']}"
-        embedding = create_embedding(openai_client, text_to_embed)
-
-        doc = {
-            "id": entry["id"],
-            "title": entry["title"],
-            "content": entry["content"],
-            "category": entry["category"],
-            "service_type": entry["service_type"],
-            "department": entry["department"],
-            "updated_date": entry["updated_date"],
-            "content_vector": embedding,
-        }
-        documents.append(doc)
-
-        if (i + 1) % 10 == 0:
-            logger.info(f"Processed {i + 1}/{len(entries)} entries")
-
-    # Upload documents
-    logger.info("Uploading documents to index...")
+    index_client = SearchIndexClient(endpoint=SEARCH_ENDPOINT, credential=credential, transport=transport)
     search_client = SearchClient(
         endpoint=SEARCH_ENDPOINT,
         index_name=INDEX_NAME,
         credential=credential,
+        transport=transport,
     )
+    store = EmbeddingStore(EMBEDDING_CACHE_PATH)
+
+    # Stream entries through embedding and upload one batch at a time, so
+    # neither the full entry list nor all documents are held in memory.
+    # Uploads run in the background while the next batch is embedded; the
+    # SDK retry policy backs off on 503/429 throttling.
+    result = []
+    total = 0
+    pending: deque[Future] = deque()
+    with ThreadPoolExecutor(max_workers=SEARCH_MAX_CONCURRENT_BATCHES + 2) as pool:
+        # Index creation and the OpenAI token fetch overlap the first
+        # embedding batch; only uploads need the index to exist
+        logger.info(f"Creating/updating index: {INDEX_NAME}")
+        index_ready: Future | None = pool.submit(ensure_index, index_client)
+        pool.submit(credential.get_token, OPENAI_TOKEN_SCOPE)
+
+        logger.info("Indexing knowledge base...")
+        for entries in iter_batches(iter_knowledge_base(), SEARCH_BATCH_SIZE):
+            documents = build_documents(entries, credential, store)
+            if index_ready is not None:
+                wait_for_index(index_ready)
+                index_ready = None
+            pending.append(pool.submit(upload_batch, search_client, documents))
+            total += len(documents)
+            logger.info(f"Processed {total} entries")
+            if len(pending) >= SEARCH_MAX_CONCURRENT_BATCHES:
+                result.extend(pending.popleft().result())
+        if index_ready is not None:
+            wait_for_index(index_ready)
+        while pending:
+            result.extend(pending.popleft().result())
 
-    result = search_client.upload_documents(documents)
     succeeded = sum(1 for r in result if r.succeeded)
-    logger.info(f"Uploaded {succeeded}/{len(documents)} documents successfully")
+    logger.info(f"Uploaded {succeeded}/{total} documents successfully")
 
-    if succeeded < len(documents):
+    if succeeded < total:
         failed = [r for r in result if not r.succeeded]
         for f in failed[:5]:  # Show first 5 failures
             logger.error(f"Failed to upload {f.key}: {f.error_message}")
 
+    session.close()
     logger.info("Index setup complete!")
 
 
@@ -11,8 +11,10 @@ from unittest.mock import AsyncMock, MagicMock, patch
 from uuid import uuid4
 
 import pytest
+import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
 
+from app.main import app as _app
 from app.models.schemas import (
     Category,
     Citation,
@@ -21,8 +23,17 @@ from app.models.schemas import (
     SearchResult,
 )
 
+# Immutable so one allocation can be shared by every test
+_MOCK_EMBEDDING: tuple[float, ...] = (0.1,) * 1536
 
-@pytest.fixture
+# Knowledge base update dates, built once; naive to match date_not_future's
+# comparison against datetime.now()
+_D1 = datetime(2024, 1, 15)
+_D2 = datetime(2024, 2, 1)
+_D3 = datetime(2024, 1, 1)
+
+
+@pytest.fixture(scope="session")
 def sample_knowledge_entries() -> list[KnowledgeBaseEntry]:
     """Sample knowledge base entries for testing."""
     return [
@@ -35,7 +46,7 @@ def sample_knowledge_entries() -> list[KnowledgeBaseEntry]:
             category=Category.SCHEDULE,
             service_type="trash",
             department="Public Works",
-            updated_date=datetime(2024, 1, 15),
+            updated_date=_D1,
         ),
         KnowledgeBaseEntry(
             id="entry-002",
@@ -46,7 +57,7 @@ def sample_knowledge_entries() -> list[KnowledgeBaseEntry]:
             category=Category.PERMIT,
             service_type="building",
             department="Planning",
-            updated_date=datetime(2024, 2, 1),
+            updated_date=_D2,
         ),
         KnowledgeBaseEntry(
             id="entry-003",
@@ -57,12 +68,12 @@ def sample_knowledge_entries() -> list[KnowledgeBaseEntry]:
             category=Category.EMERGENCY,
             service_type="emergency",
             department="Emergency Services",
-            updated_date=datetime(2024, 1, 1),
+            updated_date=_D3,
         ),
     ]
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_search_results() -> list[SearchResult]:
     """Sample search results for testing."""
     return [
@@ -91,7 +102,7 @@ def sample_search_results() -> list[SearchResult]:
     ]
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_intent() -> IntentClassification:
     """Sample intent classification for testing."""
     return IntentClassification(
@@ -101,7 +112,7 @@ def sample_intent() -> IntentClassification:
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_citations() -> list[Citation]:
     """Sample citations for testing."""
     return [
@@ -113,7 +124,7 @@ def sample_citations() -> list[Citation]:
     ]
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_openai_response() -> str:
     """Mock OpenAI chat completion response."""
     return json.dumps({
@@ -123,14 +134,14 @@ def mock_openai_response() -> str:
     })
 
 
-@pytest.fixture
-def mock_embedding() -> list[float]:
+@pytest.fixture(scope="session")
+def mock_embedding() -> tuple[float, ...]:
     """Mock embedding vector (1536 dimensions)."""
-    return [0.1] * 1536
+    return _MOCK_EMBEDDING
 
 
 @pytest.fixture
-def mock_openai_tool(mock_openai_response: str, mock_embedding: list[float]) -> MagicMock:
+def mock_openai_tool(mock_openai_response: str, mock_embedding: tuple[float, ...]) -> MagicMock:
     """Mock OpenAI tool for testing."""
     mock = MagicMock()
     mock.chat_completion = AsyncMock(return_value=mock_openai_response)
@@ -157,7 +168,7 @@ def mock_search_tool(sample_search_results: list[SearchResult]) -> MagicMock:
     return mock
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_settings() -> MagicMock:
     """Mock settings for testing."""
     mock = MagicMock()
@@ -171,18 +182,37 @@ def mock_settings() -> MagicMock:
     return mock
 
 
-@pytest.fixture
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
 async def async_client() -> AsyncGenerator[AsyncClient, None]:
-    """Async HTTP client for API testing."""
-    from app.main import app
+    """Async HTTP client for API testing, opened once per session.
 
+    Dependency overrides and patched getters are resolved per request, so
+    one client can serve every test.
+    """
     async with AsyncClient(
-        transport=ASGITransport(app=app),
+        transport=ASGITransport(app=_app),
         base_url="http://test",
     ) as client:
         yield client
 
 
+@pytest.fixture(autouse=True)
+def clear_caches() -> Any:
+    """Reset process-level caches so tests never see each other's entries."""
+    from app.cache import (
+        EmbeddingStore,
+        get_embedding_cache,
+        get_intent_cache,
+        get_semantic_cache,
+    )
+
+    with patch("app.cache._embedding_store", EmbeddingStore(":memory:")):
+        yield
+    get_intent_cache().clear()
+    get_embedding_cache().clear()
+    get_semantic_cache().clear()
+
+
 @pytest.fixture
 def anyio_backend() -> str:
     """Configure pytest-asyncio to use asyncio backend."""
@@ -192,18 +222,37 @@ def anyio_backend() -> str:
 # Patch fixtures for isolating tests from Azure services
 
 
+# Modules that import each tool getter by name and so must be patched directly
+_OPENAI_TOOL_USERS = (
+    "app.tools.openai_tool",
+    "app.agents.query_agent",
+    "app.agents.retrieve_agent",
+    "app.agents.answer_agent",
+    "app.main",
+    "app.mcp.server",
+)
+_SEARCH_TOOL_USERS = (
+    "app.tools.search_tool",
+    "app.agents.retrieve_agent",
+    "app.main",
+    "app.mcp.server",
+)
+
+
 @pytest.fixture
-def patch_openai(mock_openai_tool: MagicMock) -> Any:
+def patch_openai(mock_openai_tool: MagicMock, monkeypatch: pytest.MonkeyPatch) -> MagicMock:
     """Patch the OpenAI tool globally."""
-    with patch("app.tools.openai_tool.get_openai_tool", return_value=mock_openai_tool):
-        yield mock_openai_tool
+    for module in _OPENAI_TOOL_USERS:
+        monkeypatch.setattr(f"{module}.get_openai_tool", lambda: mock_openai_tool)
+    return mock_openai_tool
 
 
 @pytest.fixture
-def patch_search(mock_search_tool: MagicMock) -> Any:
+def patch_search(mock_search_tool: MagicMock, monkeypatch: pytest.MonkeyPatch) -> MagicMock:
     """Patch the Search tool globally."""
-    with patch("app.tools.search_tool.get_search_tool", return_value=mock_search_tool):
-        yield mock_search_tool
+    for module in _SEARCH_TOOL_USERS:
+        monkeypatch.setattr(f"{module}.get_search_tool", lambda: mock_search_tool)
+    return mock_search_tool
 
 
 @pytest.fixture
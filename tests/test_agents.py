@@ -22,6 +22,7 @@ from app.models.schemas import (
 
 
 @pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai")
 async def test_query_agent_classifies_intent(
     mock_openai_tool: MagicMock,
     sample_intent: IntentClassification,
@@ -36,23 +37,23 @@ async def test_query_agent_classifies_intent(
         })
     )
 
-    with patch("app.agents.query_agent.get_openai_tool", return_value=mock_openai_tool):
-        from app.agents.query_agent import QueryAgent
+    from app.agents.query_agent import QueryAgent
 
-        agent = QueryAgent()
+    agent = QueryAgent()
 
-        # Act
-        result = await agent.execute("When is trash pickup?")
+    # Act
+    result = await agent.execute("When is trash pickup?")
 
-        # Assert
-        assert result.output is not None
-        assert isinstance(result.output, IntentClassification)
-        assert result.output.category == Category.SCHEDULE
-        assert result.output.confidence >= 0.5
-        assert "openai" in [t.lower() for t in result.tools_used] or len(result.tools_used) > 0
+    # Assert
+    assert result.output is not None
+    assert isinstance(result.output, IntentClassification)
+    assert result.output.category == Category.SCHEDULE
+    assert result.output.confidence >= 0.5
+    assert "openai" in [t.lower() for t in result.tools_used] or len(result.tools_used) > 0
 
 
 @pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai")
 async def test_query_agent_extracts_entities(mock_openai_tool: MagicMock) -> None:
     """Test that QueryAgent extracts entities from queries."""
     # Arrange
@@ -67,24 +68,24 @@ async def test_query_agent_extracts_entities(mock_openai_tool: MagicMock) -> Non
         })
     )
 
-    with patch("app.agents.query_agent.get_openai_tool", return_value=mock_openai_tool):
-        from app.agents.query_agent import QueryAgent
+    from app.agents.query_agent import QueryAgent
 
-        agent = QueryAgent()
+    agent = QueryAgent()
 
-        # Act
-        result = await agent.execute("When is trash pickup in downtown?")
+    # Act
+    result = await agent.execute("When is trash pickup in downtown?")
 
-        # Assert
-        assert result.output is not None
-        assert isinstance(result.output, IntentClassification)
-        assert len(result.output.entities) == 2
-        entity_types = [e.type.value for e in result.output.entities]
-        assert "location" in entity_types
-        assert "service_type" in entity_types
+    # Assert
+    assert result.output is not None
+    assert isinstance(result.output, IntentClassification)
+    assert len(result.output.entities) == 2
+    entity_types = [e.type.value for e in result.output.entities]
+    assert "location" in entity_types
+    assert "service_type" in entity_types
 
 
 @pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai")
 async def test_query_agent_handles_low_confidence(mock_openai_tool: MagicMock) -> None:
     """Test that QueryAgent flags low confidence classifications."""
     # Arrange
@@ -96,96 +97,114 @@ async def test_query_agent_handles_low_confidence(mock_openai_tool: MagicMock) -
         })
     )
 
-    with patch("app.agents.query_agent.get_openai_tool", return_value=mock_openai_tool):
-        from app.agents.query_agent import QueryAgent
+    from app.agents.query_agent import QueryAgent
 
-        agent = QueryAgent()
+    agent = QueryAgent()
 
-        # Act
-        result = await agent.execute("something vague")
+    # Act
+    result = await agent.execute("something vague")
 
-        # Assert
-        assert result.output is not None
-        assert result.output.is_low_confidence is True
+    # Assert
+    assert result.output is not None
+    assert result.output.is_low_confidence is True
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai")
+async def test_query_agent_caches_exact_repeats(
+    mock_openai_tool: MagicMock,
+    mock_openai_response: str,
+) -> None:
+    """Test that QueryAgent reuses the classification of an identical query."""
+    # Arrange
+    mock_openai_tool.chat_completion = AsyncMock(return_value=mock_openai_response)
+
+    from app.agents.query_agent import QueryAgent
+
+    agent = QueryAgent()
+
+    # Act
+    first = await agent.execute("When is trash pickup?")
+    second = await agent.execute("  when is TRASH pickup?")
+
+    # Assert
+    assert second.output == first.output
+    assert second.tools_used == []
+    mock_openai_tool.chat_completion.assert_called_once()
 
 
 # RetrieveAgent Tests
 
 
 @pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai", "patch_search")
 async def test_retrieve_agent_hybrid_search(
     mock_search_tool: MagicMock,
     mock_openai_tool: MagicMock,
     sample_search_results: list[SearchResult],
     sample_intent: IntentClassification,
+    mock_embedding: tuple[float, ...],
 ) -> None:
     """Test that RetrieveAgent performs hybrid search."""
     # Arrange
-    mock_embedding = [0.1] * 1536
     mock_openai_tool.create_embedding = AsyncMock(return_value=mock_embedding)
     mock_search_tool.hybrid_search = AsyncMock(return_value=sample_search_results)
 
-    with (
-        patch("app.agents.retrieve_agent.get_openai_tool", return_value=mock_openai_tool),
-        patch("app.agents.retrieve_agent.get_search_tool", return_value=mock_search_tool),
-    ):
-        from app.agents.retrieve_agent import RetrieveAgent
+    from app.agents.retrieve_agent import RetrieveAgent
 
-        agent = RetrieveAgent()
+    agent = RetrieveAgent()
 
-        # Act
-        result = await agent.execute(("When is trash pickup?", sample_intent))
+    # Act
+    result = await agent.execute(("When is trash pickup?", sample_intent))
 
-        # Assert
-        assert result.output is not None
-        assert isinstance(result.output, list)
-        assert len(result.output) > 0
-        assert all(isinstance(r, SearchResult) for r in result.output)
-        mock_search_tool.hybrid_search.assert_called_once()
+    # Assert
+    assert result.output is not None
+    assert isinstance(result.output, list)
+    assert len(result.output) > 0
+    assert all(isinstance(r, SearchResult) for r in result.output)
+    mock_search_tool.hybrid_search.assert_called_once()
 
 
 @pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai", "patch_search")
 async def test_retrieve_agent_returns_citations(
     mock_search_tool: MagicMock,
     mock_openai_tool: MagicMock,
     sample_search_results: list[SearchResult],
     sample_intent: IntentClassification,
+    mock_embedding: tuple[float, ...],
 ) -> None:
     """Test that RetrieveAgent results can be converted to citations."""
     # Arrange
-    mock_embedding = [0.1] * 1536
     mock_openai_tool.create_embedding = AsyncMock(return_value=mock_embedding)
     mock_search_tool.hybrid_search = AsyncMock(return_value=sample_search_results)
 
-    with (
-        patch("app.agents.retrieve_agent.get_openai_tool", return_value=mock_openai_tool),
-        patch("app.agents.retrieve_agent.get_search_tool", return_value=mock_search_tool),
-    ):
-        from app.agents.retrieve_agent import RetrieveAgent
+    from app.agents.retrieve_agent import RetrieveAgent
 
-        agent = RetrieveAgent()
+    agent = RetrieveAgent()
 
-        # Act
-        result = await agent.execute(("When is trash pickup?", sample_intent))
+    # Act
+    result = await agent.execute(("When is trash pickup?", sample_intent))
 
-        # Assert
-        assert result.output is not None
-        # Each search result should have the fields needed for citations
-        for search_result in result.output:
-            assert search_result.entry_id is not None
-            assert search_result.title is not None
-            assert search_result.content is not None
+    # Assert
+    assert result.output is not None
+    # Each search result should have the fields needed for citations
+    for search_result in result.output:
+        assert search_result.entry_id is not None
+        assert search_result.title is not None
+        assert search_result.content is not None
 
 
 @pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai", "patch_search")
 async def test_retrieve_agent_filters_by_category(
     mock_search_tool: MagicMock,
     mock_openai_tool: MagicMock,
     sample_search_results: list[SearchResult],
+    mock_embedding: tuple[float, ...],
 ) -> None:
     """Test that RetrieveAgent filters by classified category."""
     # Arrange
-    mock_embedding = [0.1] * 1536
     mock_openai_tool.create_embedding = AsyncMock(return_value=mock_embedding)
     mock_search_tool.hybrid_search = AsyncMock(return_value=sample_search_results)
 
@@ -195,27 +214,176 @@ async def test_retrieve_agent_filters_by_category(
         entities=[],
     )
 
+    from app.agents.retrieve_agent import RetrieveAgent
+
+    agent = RetrieveAgent()
+
+    # Act
+    await agent.execute(("How do I get a building permit?", intent))
+
+    # Assert
+    call_args = mock_search_tool.hybrid_search.call_args
+    # Check that category filter was passed
+    assert call_args is not None
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai")
+async def test_answer_agent_keys_semantic_cache_with_local_embedder(
+    mock_openai_tool: MagicMock,
+    sample_search_results: list[SearchResult],
+    sample_intent: IntentClassification,
+) -> None:
+    """Test that a configured local embedder supplies the semantic cache key."""
+    import numpy as np
+
+    from app.cache import SemanticAnswerCache
+
+    # Arrange
+    cache = SemanticAnswerCache(threshold=0.9)
+    embedder = MagicMock()
+    embedder.encode = MagicMock(return_value=np.array([1.0, 0.0, 0.0]))
+    mock_openai_tool.chat_completion = AsyncMock(return_value="Trash is collected on Mondays [1].")
+
     with (
-        patch("app.agents.retrieve_agent.get_openai_tool", return_value=mock_openai_tool),
-        patch("app.agents.retrieve_agent.get_search_tool", return_value=mock_search_tool),
+        patch("app.agents.answer_agent.get_semantic_cache", return_value=cache),
+        patch("app.cache.get_local_embedder", return_value=embedder),
     ):
-        from app.agents.retrieve_agent import RetrieveAgent
+        from app.agents.answer_agent import AnswerAgent
 
-        agent = RetrieveAgent()
+        agent = AnswerAgent()
 
         # Act
-        await agent.execute(("How do I get a building permit?", intent))
+        await agent.execute(("When is trash pickup?", sample_search_results, sample_intent))
+        result = await agent.execute(("When's trash pickup?", sample_search_results, sample_intent))
 
         # Assert
-        call_args = mock_search_tool.hybrid_search.call_args
-        # Check that category filter was passed
-        assert call_args is not None
+        assert len(cache) == 1
+        assert result.output["answer"] == "Trash is collected on Mondays [1]."
+        mock_openai_tool.chat_completion.assert_called_once()
+
+
+def test_local_embedder_missing_package_is_decided_once(caplog: pytest.LogCaptureFixture) -> None:
+    """Test that a missing sentence-transformers install is not retried per query."""
+    import sys
+
+    from app.cache import get_local_embedder
+    from app.config import get_settings
+
+    # Arrange
+    settings = get_settings().model_copy(update={"semantic_cache_local_model": "all-MiniLM-L6-v2"})
+    get_local_embedder.cache_clear()
+
+    try:
+        with (
+            patch("app.cache.get_settings", return_value=settings),
+            patch.dict(sys.modules, {"sentence_transformers": None}),
+            caplog.at_level("WARNING", logger="app.cache"),
+        ):
+            # Act
+            first = get_local_embedder()
+            second = get_local_embedder()
+    finally:
+        get_local_embedder.cache_clear()
+
+    # Assert
+    assert first is None and second is None
+    assert caplog.text.count("sentence-transformers not installed") == 1
+
+
+def test_semantic_cache_expires_after_configured_ttl() -> None:
+    """Test that the global semantic cache stops serving answers after its TTL."""
+    import time
+
+    from app.cache import get_semantic_cache
+    from app.config import get_settings
+
+    # Arrange
+    ttl = get_settings().semantic_cache_ttl_seconds
+    cache = get_semantic_cache()
+    cache.store([1.0, 0.0], "Trash is collected on Mondays [1].", [])
+    expired = time.monotonic() + ttl + 1
+
+    # Act / Assert
+    assert cache.ttl == ttl
+    assert cache.lookup([1.0, 0.0]) is not None
+    with patch("app.cache.time.monotonic", return_value=expired):
+        assert cache.lookup([1.0, 0.0]) is None
+
+
+def test_semantic_cache_overwrites_least_recently_used_slot() -> None:
+    """Test that a full semantic cache reuses the stalest slot in place."""
+    from app.cache import SemanticAnswerCache
+
+    # Arrange
+    cache = SemanticAnswerCache(threshold=0.99, max_entries=2)
+    cache.store_entry([1.0, 0.0, 0.0], {"answer": "trash"})
+    cache.store_entry([0.0, 1.0, 0.0], {"answer": "permits"})
+    cache.lookup([1.0, 0.0, 0.0])
+
+    # Act
+    cache.store_entry([0.0, 0.0, 1.0], {"answer": "parks"})
+
+    # Assert
+    assert len(cache) == 2
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.lookup([1.0, 0.0, 0.0])[0] == {"answer": "trash"}
+    assert cache.lookup([0.0, 0.0, 1.0])[0] == {"answer": "parks"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai", "patch_search")
+async def test_retrieve_agent_uses_precomputed_embedding(
+    mock_search_tool: MagicMock,
+    mock_openai_tool: MagicMock,
+    mock_embedding: tuple[float, ...],
+    sample_intent: IntentClassification,
+) -> None:
+    """Test that RetrieveAgent skips the embedding call when one is supplied."""
+    from app.agents.retrieve_agent import RetrieveAgent
+
+    agent = RetrieveAgent()
+
+    # Act
+    result = await agent.execute(("When is trash pickup?", sample_intent, mock_embedding))
+
+    # Assert
+    assert result.output is not None
+    mock_openai_tool.create_embedding.assert_not_called()
+    assert mock_search_tool.hybrid_search.call_args.kwargs["vector"] == mock_embedding
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai", "patch_search")
+async def test_shared_agent_tracks_tools_per_call(
+    mock_search_tool: MagicMock,
+    mock_openai_tool: MagicMock,
+    mock_embedding: tuple[float, ...],
+    sample_intent: IntentClassification,
+) -> None:
+    """Test that concurrent calls on one agent instance record their own tools."""
+    import asyncio
+
+    from app.agents.retrieve_agent import RetrieveAgent
+
+    agent = RetrieveAgent()
+
+    # Act
+    with_embedding, without_embedding = await asyncio.gather(
+        agent.execute(("When is trash pickup?", sample_intent, mock_embedding)),
+        agent.execute(("When is trash pickup?", sample_intent)),
+    )
+
+    # Assert
+    assert "openai_embedding" not in with_embedding.tools_used
+    assert "openai_embedding" in without_embedding.tools_used
 
 
 # AnswerAgent Tests
 
 
 @pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai")
 async def test_answer_agent_synthesizes_response(
     mock_openai_tool: MagicMock,
     sample_search_results: list[SearchResult],
@@ -228,26 +396,26 @@ async def test_answer_agent_synthesizes_response(
         "Place your bins at the curb by 7 AM."
     )
 
-    with patch("app.agents.answer_agent.get_openai_tool", return_value=mock_openai_tool):
-        from app.agents.answer_agent import AnswerAgent
+    from app.agents.answer_agent import AnswerAgent
 
-        agent = AnswerAgent()
+    agent = AnswerAgent()
 
-        # Act
-        result = await agent.execute((
-            "When is trash pickup?",
-            sample_search_results,
-            sample_intent,
-        ))
+    # Act
+    result = await agent.execute((
+        "When is trash pickup?",
+        sample_search_results,
+        sample_intent,
+    ))
 
-        # Assert
-        assert result.output is not None
-        assert isinstance(result.output, dict)
-        assert "answer" in result.output
-        assert len(result.output["answer"]) > 0
+    # Assert
+    assert result.output is not None
+    assert isinstance(result.output, dict)
+    assert "answer" in result.output
+    assert len(result.output["answer"]) > 0
 
 
 @pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai")
 async def test_answer_agent_includes_citations(
     mock_openai_tool: MagicMock,
     sample_search_results: list[SearchResult],
@@ -259,25 +427,145 @@ async def test_answer_agent_includes_citations(
         return_value="Trash collection is on Monday and Thursday [1]."
     )
 
-    with patch("app.agents.answer_agent.get_openai_tool", return_value=mock_openai_tool):
-        from app.agents.answer_agent import AnswerAgent
+    from app.agents.answer_agent import AnswerAgent
 
-        agent = AnswerAgent()
+    agent = AnswerAgent()
 
-        # Act
-        result = await agent.execute((
-            "When is trash pickup?",
-            sample_search_results,
-            sample_intent,
-        ))
+    # Act
+    result = await agent.execute((
+        "When is trash pickup?",
+        sample_search_results,
+        sample_intent,
+    ))
 
-        # Assert
-        assert result.output is not None
-        assert "citations" in result.output
-        assert isinstance(result.output["citations"], list)
+    # Assert
+    assert result.output is not None
+    assert "citations" in result.output
+    assert isinstance(result.output["citations"], list)
 
 
 @pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai")
+async def test_answer_agent_cites_referenced_results(
+    mock_openai_tool: MagicMock,
+    sample_search_results: list[SearchResult],
+    sample_intent: IntentClassification,
+) -> None:
+    """Test that results referenced past the top three are still cited."""
+    # Arrange
+    results = [
+        sample_search_results[0].model_copy(update={"entry_id": f"entry-{i:03d}"})
+        for i in range(1, 6)
+    ]
+    mock_openai_tool.chat_completion = AsyncMock(
+        return_value="Bulk pickup is the first Monday of the month [5]."
+    )
+
+    from app.agents.answer_agent import AnswerAgent
+
+    agent = AnswerAgent()
+
+    # Act
+    result = await agent.execute(("When is bulk pickup?", results, sample_intent))
+
+    # Assert
+    cited = [c.entry_id for c in result.output["citations"]]
+    assert cited == ["entry-001", "entry-002", "entry-003", "entry-005"]
+    # Five results budget 50 + 20 * 5 answer tokens
+    assert mock_openai_tool.chat_completion.call_args.kwargs["max_tokens"] == 150
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai")
+async def test_answer_agent_limits_prompt_to_top_results(
+    mock_openai_tool: MagicMock,
+    sample_search_results: list[SearchResult],
+    sample_intent: IntentClassification,
+) -> None:
+    """Test that only the highest-scoring results reach the synthesis prompt."""
+    # Arrange
+    results = [
+        sample_search_results[0].model_copy(
+            update={"title": f"Result {i}", "relevance_score": i / 10}
+        )
+        for i in range(1, 8)
+    ]
+    mock_openai_tool.chat_completion = AsyncMock(return_value="See [1].")
+
+    from app.agents.answer_agent import AnswerAgent
+
+    agent = AnswerAgent()
+
+    # Act
+    await agent.execute(("When is trash pickup?", results, sample_intent))
+
+    # Assert
+    prompt = mock_openai_tool.chat_completion.call_args.kwargs["messages"][-1]["content"]
+    assert prompt.index("[1] Result 7") < prompt.index("[5] Result 3")
+    assert "Result 2" not in prompt
+    assert "Result 1" not in prompt
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai")
+async def test_answer_agent_returns_canonical_faq_match(
+    mock_openai_tool: MagicMock,
+    sample_search_results: list[SearchResult],
+    sample_intent: IntentClassification,
+) -> None:
+    """Test that a near-exact canonical match skips answer synthesis."""
+    # Arrange
+    top = sample_search_results[0].model_copy(
+        update={"is_canonical": True, "relevance_score": 0.95}
+    )
+    mock_openai_tool.chat_completion = AsyncMock(return_value="unused")
+
+    from app.agents.answer_agent import AnswerAgent
+
+    agent = AnswerAgent()
+
+    # Act
+    result = await agent.execute(
+        ("When is trash pickup?", [top, *sample_search_results[1:]], sample_intent)
+    )
+
+    # Assert
+    assert result.output["answer"] == top.content
+    assert [c.entry_id for c in result.output["citations"]] == [top.entry_id]
+    mock_openai_tool.chat_completion.assert_not_called()
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai")
+async def test_answer_agent_stream_raises_after_partial_answer(
+    mock_openai_tool: MagicMock,
+    sample_search_results: list[SearchResult],
+    sample_intent: IntentClassification,
+) -> None:
+    """Test that a mid-stream synthesis failure is not reported as a complete answer."""
+    # Arrange
+    async def failing_stream(**kwargs):
+        yield "Trash is collected "
+        raise RuntimeError("connection reset")
+
+    mock_openai_tool.chat_completion_stream = failing_stream
+
+    from app.agents.answer_agent import AnswerAgent
+
+    agent = AnswerAgent()
+    events = []
+
+    # Act
+    with pytest.raises(RuntimeError):
+        async for event in agent.run_stream(("When is trash pickup?", sample_search_results, sample_intent)):
+            events.append(event)
+
+    # Assert
+    assert events == [{"token": "Trash is collected "}]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai")
 async def test_answer_agent_handles_no_results(
     mock_openai_tool: MagicMock,
     sample_intent: IntentClassification,
@@ -288,20 +576,61 @@ async def test_answer_agent_handles_no_results(
         return_value="I don't have specific information about that topic."
     )
 
-    with patch("app.agents.answer_agent.get_openai_tool", return_value=mock_openai_tool):
+    from app.agents.answer_agent import AnswerAgent
+
+    agent = AnswerAgent()
+
+    # Act
+    result = await agent.execute((
+        "What about something obscure?",
+        [],  # Empty search results
+        sample_intent,
+    ))
+
+    # Assert
+    assert result.output is not None
+    assert "answer" in result.output
+    # Should provide a fallback response
+    assert len(result.output["answer"]) > 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai")
+async def test_answer_agent_serves_semantic_cache_hit(
+    mock_openai_tool: MagicMock,
+    mock_embedding: tuple[float, ...],
+    sample_search_results: list[SearchResult],
+    sample_intent: IntentClassification,
+) -> None:
+    """Test that AnswerAgent reuses a cached answer for a similar query embedding."""
+    # Arrange
+    from app.cache import SemanticAnswerCache
+
+    mock_openai_tool.chat_completion = AsyncMock(
+        return_value="Trash collection is on Monday and Thursday [1]."
+    )
+
+    with patch("app.agents.answer_agent.get_semantic_cache", return_value=SemanticAnswerCache()):
         from app.agents.answer_agent import AnswerAgent
 
         agent = AnswerAgent()
+        paraphrase_embedding = [0.1] * 1535 + [0.11]
 
         # Act
-        result = await agent.execute((
-            "What about something obscure?",
-            [],  # Empty search results
+        first = await agent.execute((
+            "When is trash pickup?",
+            sample_search_results,
+            sample_intent,
+            mock_embedding,
+        ))
+        second = await agent.execute((
+            "What day is trash picked up?",
+            sample_search_results,
             sample_intent,
+            paraphrase_embedding,
         ))
 
         # Assert
-        assert result.output is not None
-        assert "answer" in result.output
-        # Should provide a fallback response
-        assert len(result.output["answer"]) > 0
+        assert second.output["answer"] == first.output["answer"]
+        assert second.output["citations"] == first.output["citations"]
+        mock_openai_tool.chat_completion.assert_called_once()
@@ -4,12 +4,24 @@ Tests all REST API endpoints defined in contracts/api.yaml.
 """
 
 import json
-from unittest.mock import AsyncMock, MagicMock, patch
-from uuid import uuid4
+from types import SimpleNamespace
+from typing import Any, Callable, Iterator
+from unittest.mock import AsyncMock, MagicMock
+from uuid import UUID
 
 import pytest
-from httpx import ASGITransport, AsyncClient
-
+from httpx import AsyncClient, Request
+from pydantic_core import to_json
+
+from app.main import (
+    _prefetch_popular_queries,
+    app,
+    provide_answer_agent,
+    provide_openai_tool,
+    provide_query_agent,
+    provide_retrieve_agent,
+    provide_search_tool,
+)
 from app.models.schemas import (
     Category,
     Citation,
@@ -18,66 +30,146 @@ from app.models.schemas import (
 )
 
 
+class _StubAgent:
+    """Agent stand-in whose execute returns a canned result."""
+
+    def __init__(self, result: Any) -> None:
+        self._result = result
+
+    async def execute(self, *args: Any, **kwargs: Any) -> Any:
+        return self._result
+
+
+class _StubTool:
+    """Tool stand-in whose async methods return canned results by name."""
+
+    def __init__(self, **results: Any) -> None:
+        self._results = results
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            result = self._results[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+        async def method(*args: Any, **kwargs: Any) -> Any:
+            return result
+
+        return method
+
+
+# Fixed answer ids so request bodies are identical from run to run
+_STABLE_UUIDS = [UUID(int=i, version=4) for i in range(1, 9)]
+
+# Request bodies serialized once rather than by httpx on every post
+_JSON_HEADERS = {"content-type": "application/json"}
+_QUERY_PAYLOAD = to_json({"query": "When is trash pickup?"})
+_SEARCH_PAYLOAD = to_json({"query": "trash pickup", "top_k": 5})
+_FEEDBACK_PAYLOAD = to_json({
+    "answer_id": _STABLE_UUIDS[0],
+    "rating": 5,
+    "comment": "Very helpful answer!",
+})
+# Bodiless, so one request can be sent by every health case
+_HEALTH_REQUEST = Request("GET", "http://test/health")
+
+_Override = Callable[[Callable[..., Any], Any], None]
+
+
 @pytest.fixture
-def mock_pipeline() -> dict:
-    """Create mocked pipeline components."""
-    intent = IntentClassification(
-        category=Category.SCHEDULE,
-        confidence=0.92,
-        entities=[],
-    )
+def override_dependency() -> Iterator[_Override]:
+    """Swap FastAPI dependency providers for the duration of one test."""
 
-    search_results = [
-        SearchResult(
-            id="result-001",
-            entry_id="entry-001",
-            title="Trash Collection Schedule",
-            content="Trash is collected every Monday and Thursday.",
-            category=Category.SCHEDULE,
-            service_type="trash",
-            department="Public Works",
-            relevance_score=0.95,
-        ),
-    ]
+    def override(provider: Callable[..., Any], value: Any) -> None:
+        async def provide() -> Any:
+            return value
 
-    citations = [
-        Citation(
-            entry_id="entry-001",
-            title="Trash Collection Schedule",
-            snippet="Trash is collected every Monday and Thursday.",
-        ),
-    ]
+        app.dependency_overrides[provider] = provide
+
+    yield override
+    app.dependency_overrides.clear()
 
+
+# Pipeline models, validated once at import; frozen, and held in tuples so
+# no test can mutate what the others see
+_INTENT = IntentClassification(
+    category=Category.SCHEDULE,
+    confidence=0.92,
+    entities=[],
+)
+_SEARCH_RESULTS = (
+    SearchResult(
+        id="result-001",
+        entry_id="entry-001",
+        title="Trash Collection Schedule",
+        content="Trash is collected every Monday and Thursday.",
+        category=Category.SCHEDULE,
+        service_type="trash",
+        department="Public Works",
+        relevance_score=0.95,
+    ),
+)
+_CITATIONS = (
+    Citation(
+        entry_id="entry-001",
+        title="Trash Collection Schedule",
+        snippet="Trash is collected every Monday and Thursday.",
+    ),
+)
+
+
+@pytest.fixture(scope="session")
+def mock_pipeline() -> dict:
+    """Create mocked pipeline components."""
     return {
-        "intent": intent,
-        "search_results": search_results,
-        "citations": citations,
+        "intent": _INTENT,
+        "search_results": _SEARCH_RESULTS,
+        "citations": _CITATIONS,
         "answer": "Trash is collected every Monday and Thursday in most areas.",
     }
 
 
-@pytest.mark.asyncio
-async def test_submit_query_success(mock_pipeline: dict) -> None:
+@pytest.fixture
+def stub_agents(mock_pipeline: dict, monkeypatch: pytest.MonkeyPatch) -> SimpleNamespace:
+    """Swap app.main's agent getters for stubs answering from mock_pipeline.
+
+    For code paths that call the getters directly rather than through
+    FastAPI dependencies. The answer agent is a mock so calls can be checked.
+    """
+    agents = SimpleNamespace(
+        query=_StubAgent(SimpleNamespace(output=mock_pipeline["intent"])),
+        retrieve=_StubAgent(SimpleNamespace(output=mock_pipeline["search_results"])),
+        answer=MagicMock(execute=AsyncMock()),
+    )
+    monkeypatch.setattr("app.main.get_query_agent", lambda: agents.query)
+    monkeypatch.setattr("app.main.get_retrieve_agent", lambda: agents.retrieve)
+    monkeypatch.setattr("app.main.get_answer_agent", lambda: agents.answer)
+    return agents
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_submit_query_success(
+    mock_pipeline: dict,
+    async_client: AsyncClient,
+    override_dependency: _Override,
+) -> None:
     """Test successful query submission."""
     # Arrange
-    mock_query_agent = MagicMock()
-    mock_query_agent.execute = AsyncMock(return_value=MagicMock(
+    mock_query_agent = _StubAgent(SimpleNamespace(
         output=mock_pipeline["intent"],
         reasoning="Classified as schedule query",
         tools_used=["openai"],
         latency_ms=100.0,
     ))
 
-    mock_retrieve_agent = MagicMock()
-    mock_retrieve_agent.execute = AsyncMock(return_value=MagicMock(
+    mock_retrieve_agent = _StubAgent(SimpleNamespace(
         output=mock_pipeline["search_results"],
         reasoning="Found 1 relevant result",
         tools_used=["search", "openai"],
         latency_ms=200.0,
     ))
 
-    mock_answer_agent = MagicMock()
-    mock_answer_agent.execute = AsyncMock(return_value=MagicMock(
+    mock_answer_agent = _StubAgent(SimpleNamespace(
         output={
             "answer": mock_pipeline["answer"],
             "citations": mock_pipeline["citations"],
@@ -87,202 +179,303 @@ async def test_submit_query_success(mock_pipeline: dict) -> None:
         latency_ms=150.0,
     ))
 
-    with (
-        patch("app.main.QueryAgent", return_value=mock_query_agent),
-        patch("app.main.RetrieveAgent", return_value=mock_retrieve_agent),
-        patch("app.main.AnswerAgent", return_value=mock_answer_agent),
-    ):
-        from app.main import app
-
-        async with AsyncClient(
-            transport=ASGITransport(app=app),
-            base_url="http://test",
-        ) as client:
-            # Act
-            response = await client.post(
-                "/api/query",
-                json={"query": "When is trash pickup?"},
-            )
-
-            # Assert
-            assert response.status_code == 200
-            data = response.json()
-            assert "answer" in data
-            assert "citations" in data
-            assert "intent" in data
-            assert "latency_ms" in data
-
-
-@pytest.mark.asyncio
-async def test_submit_query_validation_error() -> None:
-    """Test query validation error for too-short query."""
-    from app.main import app
+    override_dependency(provide_query_agent, mock_query_agent)
+    override_dependency(provide_retrieve_agent, mock_retrieve_agent)
+    override_dependency(provide_answer_agent, mock_answer_agent)
 
-    async with AsyncClient(
-        transport=ASGITransport(app=app),
-        base_url="http://test",
-    ) as client:
-        # Act
-        response = await client.post(
-            "/api/query",
-            json={"query": "ab"},  # Too short (min 3 chars)
-        )
+    # Act
+    response = await async_client.post(
+        "/api/query",
+        content=_QUERY_PAYLOAD,
+        headers=_JSON_HEADERS,
+    )
 
-        # Assert
-        assert response.status_code == 422  # Validation error
+    # Assert
+    assert response.status_code == 200
+    # Key checks only, so match the compact body instead of decoding it
+    body = response.content
+    assert b'"answer":' in body
+    assert b'"citations":' in body
+    assert b'"intent":' in body
+    assert b'"latency_ms":' in body
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_submit_query_stream(
+    mock_pipeline: dict,
+    async_client: AsyncClient,
+    override_dependency: _Override,
+) -> None:
+    """Test that the streaming query endpoint emits token and citation events."""
+    # Arrange
+    mock_query_agent = MagicMock()
+    mock_query_agent.execute = AsyncMock(return_value=SimpleNamespace(
+        output=mock_pipeline["intent"],
+        reasoning="Classified as schedule query",
+    ))
+
+    mock_retrieve_agent = MagicMock()
+    mock_retrieve_agent.execute = AsyncMock(return_value=SimpleNamespace(
+        output=mock_pipeline["search_results"],
+        reasoning="Found 1 relevant result",
+    ))
 
+    async def run_stream(input_data):
+        yield {"token": "Trash is collected "}
+        yield {"token": "every Monday."}
+        yield {"citations": mock_pipeline["citations"]}
 
-@pytest.mark.asyncio
-async def test_search_endpoint(mock_pipeline: dict) -> None:
-    """Test direct search endpoint."""
-    mock_search_tool = MagicMock()
-    mock_search_tool.keyword_search = AsyncMock(
-        return_value=mock_pipeline["search_results"]
+    mock_answer_agent = MagicMock()
+    mock_answer_agent.run_stream = run_stream
+
+    override_dependency(provide_query_agent, mock_query_agent)
+    override_dependency(provide_retrieve_agent, mock_retrieve_agent)
+    override_dependency(provide_answer_agent, mock_answer_agent)
+
+    # Act
+    response = await async_client.post(
+        "/api/query/stream",
+        content=_QUERY_PAYLOAD,
+        headers=_JSON_HEADERS,
+    )
+
+    # Assert
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        json.loads(line.removeprefix("data: "))
+        for line in response.text.splitlines()
+        if line.startswith("data: ")
+    ]
+    assert "".join(e.get("token", "") for e in events) == "Trash is collected every Monday."
+    assert events[-1]["citations"][0]["entry_id"] == "entry-001"
+    assert events[-1]["intent"]["category"] == "schedule"
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_submit_query_stream_ends_with_error_event(
+    mock_pipeline: dict,
+    async_client: AsyncClient,
+    override_dependency: _Override,
+) -> None:
+    """Test that a mid-stream failure closes the stream with an error event."""
+    # Arrange
+    mock_query_agent = MagicMock()
+    mock_query_agent.execute = AsyncMock(return_value=SimpleNamespace(
+        output=mock_pipeline["intent"],
+        reasoning="Classified as schedule query",
+    ))
+
+    mock_retrieve_agent = MagicMock()
+    mock_retrieve_agent.execute = AsyncMock(return_value=SimpleNamespace(
+        output=mock_pipeline["search_results"],
+        reasoning="Found 1 relevant result",
+    ))
+
+    async def run_stream(input_data):
+        yield {"token": "Trash is collected "}
+        raise RuntimeError("embedding cache unavailable")
+
+    mock_answer_agent = MagicMock()
+    mock_answer_agent.run_stream = run_stream
+
+    override_dependency(provide_query_agent, mock_query_agent)
+    override_dependency(provide_retrieve_agent, mock_retrieve_agent)
+    override_dependency(provide_answer_agent, mock_answer_agent)
+
+    # Act
+    response = await async_client.post(
+        "/api/query/stream",
+        content=_QUERY_PAYLOAD,
+        headers=_JSON_HEADERS,
+    )
+
+    # Assert
+    assert response.status_code == 200
+    frames = response.text.strip().split("\n\n")
+    assert json.loads(frames[0].removeprefix("data: ")) == {"token": "Trash is collected "}
+    event, data = frames[-1].split("\n")
+    assert event == "event: error"
+    assert json.loads(data.removeprefix("data: "))["error"] == "INTERNAL_ERROR"
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_submit_query_short_circuits_greeting(
+    async_client: AsyncClient,
+    override_dependency: _Override,
+) -> None:
+    """Test that greetings skip the retrieve and answer stages."""
+    # Arrange
+    mock_query_agent = MagicMock()
+    mock_query_agent.execute = AsyncMock(return_value=SimpleNamespace(
+        output=IntentClassification(category=Category.GREETING, confidence=0.95),
+        reasoning="Classified as greeting",
+    ))
+    mock_retrieve_agent = MagicMock()
+    mock_retrieve_agent.execute = AsyncMock()
+    mock_answer_agent = MagicMock()
+    mock_answer_agent.execute = AsyncMock()
+
+    override_dependency(provide_query_agent, mock_query_agent)
+    override_dependency(provide_retrieve_agent, mock_retrieve_agent)
+    override_dependency(provide_answer_agent, mock_answer_agent)
+
+    # Act
+    response = await async_client.post("/api/query", json={"query": "hello"})
+
+    # Assert
+    assert response.status_code == 200
+    data = response.json()
+    assert data["intent"]["category"] == "greeting"
+    assert data["citations"] == []
+    mock_retrieve_agent.execute.assert_not_called()
+    mock_answer_agent.execute.assert_not_called()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_submit_query_validation_error(async_client: AsyncClient) -> None:
+    """Test query validation error for too-short query."""
+    # Act
+    response = await async_client.post(
+        "/api/query",
+        json={"query": "ab"},  # Too short (min 3 chars)
     )
 
-    with patch("app.main.get_search_tool", return_value=mock_search_tool):
-        from app.main import app
+    # Assert
+    assert response.status_code == 422  # Validation error
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_search_endpoint(
+    mock_pipeline: dict,
+    async_client: AsyncClient,
+    override_dependency: _Override,
+) -> None:
+    """Test direct search endpoint."""
+    mock_search_tool = _StubTool(keyword_search=mock_pipeline["search_results"])
+
+    override_dependency(provide_search_tool, mock_search_tool)
 
-        async with AsyncClient(
-            transport=ASGITransport(app=app),
-            base_url="http://test",
-        ) as client:
-            # Act
-            response = await client.post(
-                "/api/search",
-                json={"query": "trash pickup", "top_k": 5},
-            )
+    # Act
+    response = await async_client.post(
+        "/api/search",
+        content=_SEARCH_PAYLOAD,
+        headers=_JSON_HEADERS,
+    )
 
-            # Assert
-            assert response.status_code == 200
-            data = response.json()
-            assert "results" in data
-            assert "total_count" in data
+    # Assert
+    assert response.status_code == 200
+    body = response.content
+    assert b'"results":' in body
+    assert b'"total_count":' in body
 
 
-@pytest.mark.asyncio
-async def test_categories_endpoint() -> None:
+@pytest.mark.asyncio(loop_scope="session")
+async def test_categories_endpoint(
+    async_client: AsyncClient,
+    override_dependency: _Override,
+) -> None:
     """Test categories listing endpoint."""
-    mock_search_tool = MagicMock()
-    mock_search_tool.get_categories = AsyncMock(return_value={
+    mock_search_tool = _StubTool(get_categories={
         "schedule": 10,
         "event": 5,
         "permit": 8,
     })
 
-    with patch("app.main.get_search_tool", return_value=mock_search_tool):
-        from app.main import app
+    override_dependency(provide_search_tool, mock_search_tool)
 
-        async with AsyncClient(
-            transport=ASGITransport(app=app),
-            base_url="http://test",
-        ) as client:
-            # Act
-            response = await client.get("/api/categories")
+    # Act
+    response = await async_client.get("/api/categories")
 
-            # Assert
-            assert response.status_code == 200
-            data = response.json()
-            assert "categories" in data
-            assert len(data["categories"]) == 3
+    # Assert
+    assert response.status_code == 200
+    data = response.json()
+    assert "categories" in data
+    assert len(data["categories"]) == 3
 
 
-@pytest.mark.asyncio
-async def test_feedback_endpoint() -> None:
+@pytest.mark.asyncio(loop_scope="session")
+async def test_feedback_endpoint(async_client: AsyncClient) -> None:
     """Test feedback submission endpoint."""
-    from app.main import app
-
-    async with AsyncClient(
-        transport=ASGITransport(app=app),
-        base_url="http://test",
-    ) as client:
-        # Act
-        response = await client.post(
-            "/api/feedback",
-            json={
-                "answer_id": str(uuid4()),
-                "rating": 5,
-                "comment": "Very helpful answer!",
-            },
-        )
-
-        # Assert
-        assert response.status_code == 201
-        data = response.json()
-        assert data["status"] == "received"
-
-
-@pytest.mark.asyncio
-async def test_health_endpoint() -> None:
-    """Test health check endpoint."""
-    mock_openai_tool = MagicMock()
-    mock_openai_tool.check_connection = AsyncMock(return_value=True)
-
-    mock_search_tool = MagicMock()
-    mock_search_tool.check_connection = AsyncMock(return_value=True)
-
-    with (
-        patch("app.main.get_openai_tool", return_value=mock_openai_tool),
-        patch("app.main.get_search_tool", return_value=mock_search_tool),
-    ):
-        from app.main import app
-
-        async with AsyncClient(
-            transport=ASGITransport(app=app),
-            base_url="http://test",
-        ) as client:
-            # Act
-            response = await client.get("/health")
-
-            # Assert
-            assert response.status_code == 200
-            data = response.json()
-            assert "status" in data
-            assert "version" in data
-
-
-@pytest.mark.asyncio
-async def test_health_endpoint_degraded() -> None:
-    """Test health endpoint when a service is unavailable."""
+    # Act
+    response = await async_client.post(
+        "/api/feedback",
+        content=_FEEDBACK_PAYLOAD,
+        headers=_JSON_HEADERS,
+    )
+
+    # Assert
+    assert response.status_code == 201
+    data = response.json()
+    assert data["status"] == "received"
+    assert UUID(data["id"]).version == 7
+
+
+@pytest.mark.asyncio(loop_scope="session")
+@pytest.mark.parametrize(
+    ("openai_ok", "search_ok", "expected_statuses"),
+    [
+        (True, True, {"healthy"}),
+        (True, False, {"degraded", "unhealthy"}),
+        # Deployed check: no overrides, so the real tools answer
+        (None, None, None),
+    ],
+    ids=["healthy", "degraded", "deployed"],
+)
+async def test_health_endpoint(
+    async_client: AsyncClient,
+    override_dependency: _Override,
+    openai_ok: bool | None,
+    search_ok: bool | None,
+    expected_statuses: set[str] | None,
+) -> None:
+    """Test health check endpoint with mocked and real service connections."""
+    # Arrange
+    if openai_ok is not None:
+        override_dependency(provide_openai_tool, _StubTool(check_connection=openai_ok))
+        override_dependency(provide_search_tool, _StubTool(check_connection=search_ok))
+
+    # Act
+    response = await async_client.send(_HEALTH_REQUEST)
+
+    # Assert
+    assert response.status_code == 200
+    data = response.json()
+    assert "status" in data
+    assert "version" in data
+    if expected_statuses is not None:
+        assert data["status"] in expected_statuses
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_prefetch_popular_queries(
+    stub_agents: SimpleNamespace,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path,
+) -> None:
+    """Test that popular queries missing the semantic cache are answered ahead of time."""
+    # Arrange
+    from app.cache import QueryLog, SemanticAnswerCache
+
+    query_log = QueryLog(str(tmp_path / "query_log.db"))
+    for query in ["When is trash pickup?", "When is trash pickup?", "Park hours"]:
+        query_log.record(query)
+
+    semantic_cache = SemanticAnswerCache()
     mock_openai_tool = MagicMock()
-    mock_openai_tool.check_connection = AsyncMock(return_value=True)
-
-    mock_search_tool = MagicMock()
-    mock_search_tool.check_connection = AsyncMock(return_value=False)
-
-    with (
-        patch("app.main.get_openai_tool", return_value=mock_openai_tool),
-        patch("app.main.get_search_tool", return_value=mock_search_tool),
-    ):
-        from app.main import app
-
-        async with AsyncClient(
-            transport=ASGITransport(app=app),
-            base_url="http://test",
-        ) as client:
-            # Act
-            response = await client.get("/health")
-
-            # Assert
-            assert response.status_code == 200
-            data = response.json()
-            assert data["status"] in ["degraded", "unhealthy"]
-
-
-@pytest.mark.asyncio
-async def test_deployed_health_check() -> None:
-    """Integration test for health endpoint (placeholder for deployment testing)."""
-    # This test would be run against a deployed instance
-    # For unit testing, we just verify the endpoint structure
-    from app.main import app
-
-    async with AsyncClient(
-        transport=ASGITransport(app=app),
-        base_url="http://test",
-    ) as client:
-        response = await client.get("/health")
-        assert response.status_code == 200
-        # Verify response structure
-        data = response.json()
-        assert "status" in data
-        assert "version" in data
+    mock_openai_tool.create_embedding = AsyncMock(
+        side_effect=lambda text: [1.0, 0.0] if "trash" in text else [0.0, 1.0]
+    )
+    semantic_cache.store([0.0, 1.0], "Parks are open dawn to dusk.", [])
+
+    monkeypatch.setattr("app.main.get_query_log", lambda: query_log)
+    monkeypatch.setattr("app.main.get_semantic_cache", lambda: semantic_cache)
+    monkeypatch.setattr("app.agents.retrieve_agent.get_openai_tool", lambda: mock_openai_tool)
+
+    # Act
+    await _prefetch_popular_queries()
+
+    # Assert
+    assert query_log.top(1) == ["when is trash pickup?"]
+    stub_agents.answer.execute.assert_called_once()
+    assert stub_agents.answer.execute.call_args.args[0][0] == "when is trash pickup?"
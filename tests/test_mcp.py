@@ -66,7 +66,7 @@ async def test_civicnav_query_tool(mock_query_response: dict) -> None:
         assert result is not None
         assert "answer" in result
         assert "citations" in result
-        mock_query.assert_called_once_with("When is trash pickup?")
+        mock_query.assert_called_once_with("When is trash pickup?", None)
 
 
 @pytest.mark.asyncio
@@ -139,11 +139,11 @@ async def test_civicnav_query_tool_error_handling() -> None:
     The error handling happens inside submit_query_internal, so we need
     to patch the QueryAgent to throw an exception to test the error path.
     """
-    with patch("app.mcp.server.QueryAgent") as mock_agent_class:
+    with patch("app.mcp.server.get_query_agent") as mock_get_agent:
         # Make the QueryAgent.execute raise an exception
         mock_agent = MagicMock()
         mock_agent.execute = AsyncMock(side_effect=Exception("Connection failed"))
-        mock_agent_class.return_value = mock_agent
+        mock_get_agent.return_value = mock_agent
 
         from app.mcp.server import civicnav_query
 
@@ -156,6 +156,192 @@ async def test_civicnav_query_tool_error_handling() -> None:
         assert "Connection failed" in result["error"]
 
 
+@pytest.mark.asyncio
+async def test_submit_query_reuses_speculative_search() -> None:
+    """Test that the speculative keyword search replaces retrieval when compatible."""
+    # Arrange
+    results = [
+        SearchResult(
+            id="entry-001",
+            entry_id="entry-001",
+            title="Trash Collection",
+            content="Trash is collected Monday and Thursday.",
+            category=Category.SCHEDULE,
+            relevance_score=0.95,
+        )
+    ]
+    intent = IntentClassification(category=Category.SCHEDULE, confidence=0.9)
+
+    mock_search_tool = MagicMock()
+    mock_search_tool.keyword_search = AsyncMock(return_value=results)
+    mock_query_agent = MagicMock()
+    mock_query_agent.execute = AsyncMock(return_value=MagicMock(output=intent))
+    mock_retrieve_agent = MagicMock()
+    mock_retrieve_agent.execute = AsyncMock()
+    mock_answer_agent = MagicMock()
+    mock_answer_agent.execute = AsyncMock(return_value=MagicMock(
+        output={"answer": "Trash is collected Monday and Thursday.", "citations": []},
+    ))
+
+    with (
+        patch("app.mcp.server.get_search_tool", return_value=mock_search_tool),
+        patch("app.mcp.server.embed_query", new_callable=AsyncMock, return_value=None),
+        patch("app.mcp.server.get_query_agent", return_value=mock_query_agent),
+        patch("app.mcp.server.get_retrieve_agent", return_value=mock_retrieve_agent),
+        patch("app.mcp.server.get_answer_agent", return_value=mock_answer_agent),
+    ):
+        from app.mcp.server import submit_query_internal
+
+        # Act
+        result = await submit_query_internal("When is trash pickup?")
+
+        # Assert
+        assert result["intent"]["category"] == "schedule"
+        mock_retrieve_agent.execute.assert_not_called()
+        assert mock_answer_agent.execute.call_args.args[0][1] == results
+
+
+@pytest.mark.asyncio
+async def test_submit_query_skips_keyword_search_when_embedding_succeeds() -> None:
+    """Test that the keyword fallback only reaches Search when embedding fails."""
+    from app.mcp.server import submit_query_internal
+
+    # Arrange
+    intent = IntentClassification(category=Category.SCHEDULE, confidence=0.9)
+    mock_search_tool = MagicMock()
+    mock_search_tool.keyword_search = AsyncMock(return_value=[])
+    mock_query_agent = MagicMock()
+    mock_query_agent.execute = AsyncMock(return_value=MagicMock(output=intent))
+    mock_retrieve_agent = MagicMock()
+    mock_retrieve_agent.execute = AsyncMock(return_value=MagicMock(output=[]))
+    mock_answer_agent = MagicMock()
+    mock_answer_agent.execute = AsyncMock(
+        return_value=MagicMock(output={"answer": "Trash is collected on Monday.", "citations": []})
+    )
+
+    with (
+        patch("app.mcp.server.get_search_tool", return_value=mock_search_tool),
+        patch("app.mcp.server.embed_query", new_callable=AsyncMock, return_value=[1.0, 0.0]),
+        patch("app.mcp.server.get_query_agent", return_value=mock_query_agent),
+        patch("app.mcp.server.get_retrieve_agent", return_value=mock_retrieve_agent),
+        patch("app.mcp.server.get_answer_agent", return_value=mock_answer_agent),
+    ):
+        # Act
+        await submit_query_internal("When is trash pickup?")
+
+        # Assert
+        mock_search_tool.keyword_search.assert_not_called()
+        mock_retrieve_agent.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_submit_query_category_hint_skips_classification() -> None:
+    """Test that a caller-supplied category bypasses the QueryAgent."""
+    from app.mcp.server import submit_query_internal
+
+    # Arrange
+    mock_query_agent = MagicMock()
+    mock_query_agent.execute = AsyncMock()
+    mock_retrieve_agent = MagicMock()
+    mock_retrieve_agent.execute = AsyncMock(return_value=MagicMock(output=[]))
+    mock_answer_agent = MagicMock()
+    mock_answer_agent.execute = AsyncMock(
+        return_value=MagicMock(output={"answer": "Trash is collected on Monday.", "citations": []})
+    )
+
+    with (
+        patch("app.mcp.server.embed_query", new_callable=AsyncMock, return_value=[1.0, 0.0]),
+        patch("app.mcp.server.get_query_agent", return_value=mock_query_agent),
+        patch("app.mcp.server.get_retrieve_agent", return_value=mock_retrieve_agent),
+        patch("app.mcp.server.get_answer_agent", return_value=mock_answer_agent),
+    ):
+        # Act
+        result = await submit_query_internal("When is trash pickup?", "schedule")
+
+        # Assert
+        mock_query_agent.execute.assert_not_called()
+        _, intent, _ = mock_retrieve_agent.execute.call_args.args[0]
+        assert intent.category == Category.SCHEDULE
+        assert intent.confidence == 1.0
+        assert result["intent"]["category"] == "schedule"
+
+
+@pytest.mark.asyncio
+async def test_submit_query_streams_answer_tokens() -> None:
+    """Test that answer tokens are forwarded while the query is answered."""
+    from app.mcp.server import _token_sink, submit_query_internal
+
+    # Arrange
+    intent = IntentClassification(category=Category.SCHEDULE, confidence=0.9)
+    citation = Citation(entry_id="entry-001", title="Trash Collection", snippet="Monday")
+
+    mock_query_agent = MagicMock()
+    mock_query_agent.execute = AsyncMock(return_value=MagicMock(output=intent))
+    mock_retrieve_agent = MagicMock()
+    mock_retrieve_agent.execute = AsyncMock(return_value=MagicMock(output=[]))
+
+    async def run_stream(input_data):
+        yield {"token": "Trash is collected "}
+        yield {"token": "on Monday."}
+        yield {"citations": [citation]}
+
+    mock_answer_agent = MagicMock()
+    mock_answer_agent.run_stream = run_stream
+    received: list[str] = []
+
+    async def on_token(text: str) -> None:
+        received.append(text)
+
+    with (
+        patch("app.mcp.server.embed_query", new_callable=AsyncMock, return_value=[1.0, 0.0]),
+        patch("app.mcp.server.get_query_agent", return_value=mock_query_agent),
+        patch("app.mcp.server.get_retrieve_agent", return_value=mock_retrieve_agent),
+        patch("app.mcp.server.get_answer_agent", return_value=mock_answer_agent),
+    ):
+        sink = _token_sink.set(on_token)
+        try:
+            # Act
+            result = await submit_query_internal("When is trash pickup?")
+        finally:
+            _token_sink.reset(sink)
+
+        # Assert
+        assert received == ["Trash is collected ", "on Monday."]
+        assert result["answer"] == "Trash is collected on Monday."
+        assert result["citations"][0]["entry_id"] == "entry-001"
+
+
+@pytest.mark.asyncio
+async def test_civicnav_query_response_cache(mock_query_response: dict) -> None:
+    """Test that repeat queries are cached until the answer is rated poorly."""
+    from app.config import get_settings
+
+    # Arrange
+    settings = get_settings().model_copy(update={"civicnav_semantic_cache": True})
+    response = {**mock_query_response, "id": "answer-001"}
+
+    with (
+        patch("app.mcp.server.get_settings", return_value=settings),
+        patch("app.mcp.server._response_cache", None),
+        patch("app.mcp.server._semantic_response_cache", None),
+        patch("app.mcp.server.embed_query", new_callable=AsyncMock, return_value=[1.0, 0.0]),
+        patch("app.mcp.server.submit_query_internal", new_callable=AsyncMock) as mock_query,
+    ):
+        mock_query.return_value = response
+
+        from app.mcp.server import civicnav_feedback, civicnav_query
+
+        # Act
+        await civicnav_query("When is trash pickup?")
+        cached = await civicnav_query("  when is TRASH pickup?")
+        await civicnav_feedback(answer_id="answer-001", rating=1)
+        await civicnav_query("When is trash pickup?")
+
+        # Assert
+        assert cached == response
+        assert mock_query.call_count == 2
+
+
 @pytest.mark.asyncio
 async def test_civicnav_search_with_category_filter(mock_search_results: list[dict]) -> None:
     """Test search with category filter."""
@@ -169,3 +355,23 @@ async def test_civicnav_search_with_category_filter(mock_search_results: list[di
 
         # Assert
         mock_search.assert_called_once_with("pickup", 3, "schedule")
+
+
+@pytest.mark.asyncio
+async def test_main_closes_shared_clients_on_exit() -> None:
+    """Test that the stdio entry point releases the same resources as the API lifespan."""
+    # Arrange
+    with (
+        patch("app.mcp.server.stdio_server", side_effect=RuntimeError("stdin closed")),
+        patch("app.mcp.server.close_credential", new_callable=AsyncMock) as close_credential,
+        patch("app.mcp.server.close_http_client", new_callable=AsyncMock) as close_http_client,
+    ):
+        from app.mcp.server import main
+
+        # Act
+        with pytest.raises(RuntimeError):
+            await main()
+
+        # Assert
+        close_credential.assert_awaited_once()
+        close_http_client.assert_awaited_once()
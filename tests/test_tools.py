@@ -3,19 +3,27 @@
 Tests the OpenAI and Search tool wrappers with mocked Azure services.
 """
 
+from typing import AsyncIterator
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from app.models.schemas import Category, SearchResult
+from app.models.schemas import Category, IntentClassification, SearchResult
 
 
 # Search Tool Tests
 
 
+def _async_results(items: list[dict]) -> MagicMock:
+    """Build a mock of the async pager returned by the aio SearchClient."""
+    pager = MagicMock()
+    pager.__aiter__.return_value = items
+    return pager
+
+
 @pytest.mark.asyncio
 async def test_search_tool_vector_search(
-    mock_embedding: list[float],
+    mock_embedding: tuple[float, ...],
 ) -> None:
     """Test vector search functionality."""
     # Arrange
@@ -33,10 +41,10 @@ async def test_search_tool_vector_search(
     ]
 
     mock_client = MagicMock()
-    mock_client.search = MagicMock(return_value=iter(mock_results))
+    mock_client.search = AsyncMock(return_value=_async_results(mock_results))
 
     # Patch at the azure SDK level, not the module level
-    with patch("azure.search.documents.SearchClient", return_value=mock_client):
+    with patch("azure.search.documents.aio.SearchClient", return_value=mock_client):
         from app.tools.search_tool import SearchTool
 
         tool = SearchTool()
@@ -72,9 +80,9 @@ async def test_search_tool_keyword_search() -> None:
     ]
 
     mock_client = MagicMock()
-    mock_client.search = MagicMock(return_value=iter(mock_results))
+    mock_client.search = AsyncMock(return_value=_async_results(mock_results))
 
-    with patch("azure.search.documents.SearchClient", return_value=mock_client):
+    with patch("azure.search.documents.aio.SearchClient", return_value=mock_client):
         from app.tools.search_tool import SearchTool
 
         tool = SearchTool()
@@ -91,9 +99,129 @@ async def test_search_tool_keyword_search() -> None:
         assert results[0].category == Category.PERMIT
 
 
+@pytest.mark.asyncio
+async def test_search_tool_keyword_search_iter_stops_early() -> None:
+    """Test that the streaming search lets callers stop after the first hit."""
+    # Arrange
+    mock_results = [
+        {
+            "id": f"entry-00{i}",
+            "title": f"Entry {i}",
+            "content": "City services information.",
+            "category": "general",
+            "@search.score": 1.0 - i / 10,
+        }
+        for i in range(3)
+    ]
+
+    mock_client = MagicMock()
+    mock_client.search = AsyncMock(return_value=_async_results(mock_results))
+
+    with patch("azure.search.documents.aio.SearchClient", return_value=mock_client):
+        from app.tools.search_tool import SearchTool
+
+        tool = SearchTool()
+        tool._client = mock_client
+
+        # Act
+        async for result in tool.keyword_search_iter(query="city services"):
+            first = result
+            break
+
+        # Assert
+        assert isinstance(first, SearchResult)
+        assert first.entry_id == "entry-000"
+
+
+@pytest.mark.asyncio
+async def test_search_tool_falls_back_for_index_without_is_canonical() -> None:
+    """Test that an index built before is_canonical existed still serves searches."""
+    from azure.core.exceptions import HttpResponseError
+
+    # Arrange
+    async def rejected_pager() -> AsyncIterator[dict]:
+        raise HttpResponseError(
+            message="Could not find a property named 'is_canonical'",
+            response=MagicMock(status_code=400),
+        )
+        yield {}
+
+    mock_results = [
+        {
+            "id": "entry-002",
+            "title": "Building Permits",
+            "content": "Apply for permits at City Hall.",
+            "category": "permit",
+            "@search.score": 0.88,
+        }
+    ]
+
+    mock_client = MagicMock()
+    mock_client.search = AsyncMock(
+        side_effect=[rejected_pager(), _async_results(mock_results), _async_results(mock_results)]
+    )
+
+    with patch("azure.search.documents.aio.SearchClient", return_value=mock_client):
+        from app.tools.search_tool import SearchTool
+
+        tool = SearchTool()
+        tool._client = mock_client
+
+        # Act
+        first = await tool.keyword_search(query="building permit")
+        second = await tool.keyword_search(query="building permit")
+
+    # Assert
+    selects = [call.kwargs["select"] for call in mock_client.search.call_args_list]
+    assert "is_canonical" in selects[0]
+    assert "is_canonical" not in selects[1]
+    assert selects[2] == selects[1]
+    assert first == second
+    assert first[0].is_canonical is False
+
+
+@pytest.mark.asyncio
+async def test_search_tool_trusted_source_skips_validation() -> None:
+    """Test that hits from a trusted index are built without validation."""
+    from app.config import get_settings
+
+    # Arrange
+    settings = get_settings().model_copy(update={"trusted_search_source": True})
+    mock_results = [
+        {
+            "id": "entry-002",
+            "title": "Building Permits",
+            "content": "Apply for permits at City Hall.",
+            "category": "permit",
+            "@search.score": 0.88,
+        }
+    ]
+
+    mock_client = MagicMock()
+    mock_client.search = AsyncMock(return_value=_async_results(mock_results))
+
+    with (
+        patch("azure.search.documents.aio.SearchClient", return_value=mock_client),
+        patch("app.tools.search_tool.get_settings", return_value=settings),
+        patch.object(SearchResult, "model_construct", wraps=SearchResult.model_construct) as construct,
+    ):
+        from app.tools.search_tool import SearchTool
+
+        tool = SearchTool()
+        tool._client = mock_client
+
+        # Act
+        results = await tool.keyword_search(query="building permit")
+
+        # Assert
+        construct.assert_called_once()
+        assert results[0].category == Category.PERMIT
+        assert results[0].highlight is None
+
+
 @pytest.mark.asyncio
 async def test_search_tool_hybrid_search(
-    mock_embedding: list[float],
+    mock_embedding: tuple[float, ...],
 ) -> None:
     """Test hybrid search combining vector, keyword, and semantic."""
     # Arrange
@@ -119,9 +247,9 @@ async def test_search_tool_hybrid_search(
     ]
 
     mock_client = MagicMock()
-    mock_client.search = MagicMock(return_value=iter(mock_results))
+    mock_client.search = AsyncMock(return_value=_async_results(mock_results))
 
-    with patch("azure.search.documents.SearchClient", return_value=mock_client):
+    with patch("azure.search.documents.aio.SearchClient", return_value=mock_client):
         from app.tools.search_tool import SearchTool
 
         tool = SearchTool()
@@ -140,9 +268,59 @@ async def test_search_tool_hybrid_search(
         assert results[0].relevance_score >= results[1].relevance_score
 
 
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("patch_openai")
+async def test_search_tool_reranker_score_drives_faq_fast_path(
+    mock_openai_tool: MagicMock,
+    mock_embedding: tuple[float, ...],
+    sample_intent: IntentClassification,
+) -> None:
+    """Test that Azure-shaped hybrid scores still reach the FAQ fast path."""
+    # Arrange: hybrid RRF scores are tiny; the semantic reranker scores 0-4
+    mock_results = [
+        {
+            "id": "entry-001",
+            "title": "Trash Schedule",
+            "content": "Trash is collected every Monday.",
+            "category": "schedule",
+            "is_canonical": True,
+            "@search.score": 0.0328,
+            "@search.reranker_score": 3.8,
+        },
+        {
+            "id": "entry-003",
+            "title": "Recycling Schedule",
+            "content": "Recycling is every Wednesday.",
+            "category": "schedule",
+            "@search.score": 0.0161,
+            "@search.reranker_score": 2.1,
+        },
+    ]
+
+    mock_client = MagicMock()
+    mock_client.search = AsyncMock(return_value=_async_results(mock_results))
+    mock_openai_tool.chat_completion = AsyncMock(return_value="unused")
+
+    with patch("azure.search.documents.aio.SearchClient", return_value=mock_client):
+        from app.agents.answer_agent import AnswerAgent
+        from app.tools.search_tool import SearchTool
+
+        tool = SearchTool()
+        tool._client = mock_client
+
+        # Act
+        results = await tool.hybrid_search(query="when is trash pickup", vector=mock_embedding)
+        result = await AnswerAgent().execute(("When is trash pickup?", results, sample_intent))
+
+    # Assert
+    assert [r.relevance_score for r in results] == [0.95, 0.525]
+    assert result.output["answer"] == "Trash is collected every Monday."
+    mock_openai_tool.chat_completion.assert_not_called()
+
+
 @pytest.mark.asyncio
 async def test_search_tool_category_filter(
-    mock_embedding: list[float],
+    mock_embedding: tuple[float, ...],
 ) -> None:
     """Test search with category filter."""
     # Arrange
@@ -159,9 +337,9 @@ async def test_search_tool_category_filter(
     ]
 
     mock_client = MagicMock()
-    mock_client.search = MagicMock(return_value=iter(mock_results))
+    mock_client.search = AsyncMock(return_value=_async_results(mock_results))
 
-    with patch("azure.search.documents.SearchClient", return_value=mock_client):
+    with patch("azure.search.documents.aio.SearchClient", return_value=mock_client):
         from app.tools.search_tool import SearchTool
 
         tool = SearchTool()
@@ -196,12 +374,12 @@ async def test_search_tool_get_categories() -> None:
     }
 
     mock_results = MagicMock()
-    mock_results.get_facets = MagicMock(return_value=mock_facets)
+    mock_results.get_facets = AsyncMock(return_value=mock_facets)
 
     mock_client = MagicMock()
-    mock_client.search = MagicMock(return_value=mock_results)
+    mock_client.search = AsyncMock(return_value=mock_results)
 
-    with patch("azure.search.documents.SearchClient", return_value=mock_client):
+    with patch("azure.search.documents.aio.SearchClient", return_value=mock_client):
         from app.tools.search_tool import SearchTool
 
         tool = SearchTool()
@@ -216,6 +394,38 @@ async def test_search_tool_get_categories() -> None:
         assert categories["event"] == 5
 
 
+@pytest.mark.asyncio
+async def test_search_tool_caches_categories_until_ttl_expires() -> None:
+    """Test that category counts are cached for categories_cache_ttl_seconds."""
+    import time
+
+    from app.config import get_settings
+
+    # Arrange
+    ttl = get_settings().categories_cache_ttl_seconds
+    mock_results = MagicMock()
+    mock_results.get_facets = AsyncMock(return_value={"category": [{"value": "schedule", "count": 3}]})
+
+    mock_client = MagicMock()
+    mock_client.search = AsyncMock(return_value=mock_results)
+
+    with patch("azure.search.documents.aio.SearchClient", return_value=mock_client):
+        from app.tools.search_tool import SearchTool
+
+        tool = SearchTool()
+        tool._client = mock_client
+
+        # Act
+        await tool.get_categories()
+        await tool.get_categories()
+        with patch("app.tools.search_tool.time.monotonic", return_value=time.monotonic() + ttl + 1):
+            categories = await tool.get_categories()
+
+        # Assert
+        assert categories == {"schedule": 3}
+        assert mock_client.search.await_count == 2
+
+
 # OpenAI Tool Tests
 
 
@@ -272,6 +482,98 @@ async def test_openai_tool_create_embedding() -> None:
         assert embedding == mock_embedding
 
 
+@pytest.mark.asyncio
+async def test_openai_tool_create_embeddings_batch() -> None:
+    """Test batched embedding creation preserves input order."""
+    # Arrange
+    mock_response = MagicMock()
+    mock_response.data = [
+        MagicMock(index=1, embedding=[0.2] * 1536),
+        MagicMock(index=0, embedding=[0.1] * 1536),
+    ]
+
+    mock_client = MagicMock()
+    mock_client.embeddings.create = AsyncMock(return_value=mock_response)
+
+    with patch("openai.AsyncAzureOpenAI", return_value=mock_client):
+        from app.tools.openai_tool import OpenAITool
+
+        tool = OpenAITool()
+        tool._client = mock_client
+
+        # Act
+        embeddings = await tool.create_embeddings(["first", "second"])
+
+        # Assert
+        assert embeddings == [[0.1] * 1536, [0.2] * 1536]
+        mock_client.embeddings.create.assert_called_once()
+        assert mock_client.embeddings.create.call_args.kwargs["input"] == ["first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_openai_tool_coalesces_concurrent_embeddings() -> None:
+    """Test that concurrent single-text embeddings share one request."""
+    import asyncio
+
+    # Arrange
+    mock_response = MagicMock()
+    mock_response.data = [
+        MagicMock(index=i, embedding=[float(i)] * 4) for i in range(3)
+    ]
+
+    mock_client = MagicMock()
+    mock_client.embeddings.create = AsyncMock(return_value=mock_response)
+
+    with patch("openai.AsyncAzureOpenAI", return_value=mock_client):
+        from app.tools.openai_tool import OpenAITool
+
+        tool = OpenAITool()
+        tool._client = mock_client
+
+        # Act
+        embeddings = await asyncio.gather(
+            tool.create_embedding("a"),
+            tool.create_embedding("b"),
+            tool.create_embedding("c"),
+        )
+
+        # Assert
+        assert embeddings == [[0.0] * 4, [1.0] * 4, [2.0] * 4]
+        mock_client.embeddings.create.assert_called_once()
+        assert mock_client.embeddings.create.call_args.kwargs["input"] == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_openai_tool_embeddings_deduplicated_and_stored() -> None:
+    """Test that repeated texts are embedded once and then served from the store."""
+    # Arrange
+    mock_response = MagicMock()
+    mock_response.data = [
+        MagicMock(index=0, embedding=[0.5] * 4),
+        MagicMock(index=1, embedding=[0.25] * 4),
+    ]
+
+    mock_client = MagicMock()
+    mock_client.embeddings.create = AsyncMock(return_value=mock_response)
+
+    with patch("openai.AsyncAzureOpenAI", return_value=mock_client):
+        from app.tools.openai_tool import OpenAITool
+
+        tool = OpenAITool()
+        tool._client = mock_client
+
+        # Act
+        batch = await tool.create_embeddings(["trash", "parks", "trash"])
+        tool.embedding_store._memory.clear()  # Force the read back from SQLite
+        single = await tool.create_embedding("parks")
+
+        # Assert
+        assert batch == [[0.5] * 4, [0.25] * 4, [0.5] * 4]
+        assert single == [0.25] * 4
+        mock_client.embeddings.create.assert_called_once()
+        assert mock_client.embeddings.create.call_args.kwargs["input"] == ["trash", "parks"]
+
+
 @pytest.mark.asyncio
 async def test_openai_tool_connection_check_success() -> None:
     """Test successful connection check."""
@@ -316,3 +618,126 @@ async def test_openai_tool_connection_check_failure() -> None:
 
         # Assert
         assert connected is False
+
+
+@pytest.mark.asyncio
+async def test_demo_openai_stream_does_not_append_fallback_after_tokens() -> None:
+    """Test that a stream failing mid-answer is re-raised instead of padded."""
+    from app.config import get_settings
+    from app.tools.openai_tool import DemoOpenAITool
+
+    # Arrange
+    async def failing_stream() -> AsyncIterator[MagicMock]:
+        yield MagicMock(choices=[MagicMock(delta=MagicMock(content="Trash is "))])
+        raise RuntimeError("connection reset")
+
+    tool = DemoOpenAITool()
+    tool.settings = get_settings().model_copy(update={"use_openai": True, "openai_api_key": "sk-test"})
+    tool._openai_client = MagicMock()
+    tool._openai_client.chat.completions.create = AsyncMock(return_value=failing_stream())
+    tool.chat_completion = AsyncMock(return_value="Fallback answer.")
+    tokens = []
+
+    # Act
+    with pytest.raises(RuntimeError):
+        async for token in tool.chat_completion_stream([{"role": "user", "content": "trash?"}]):
+            tokens.append(token)
+
+    # Assert
+    assert tokens == ["Trash is "]
+    tool.chat_completion.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_demo_embeddings_leave_uuid7_random_bits_alone() -> None:
+    """Test that mock embeddings are deterministic without reseeding shared randomness."""
+    from app.models.schemas import uuid7
+    from app.tools.openai_tool import DemoOpenAITool
+
+    # Arrange
+    tool = DemoOpenAITool()
+
+    # Act
+    first = await tool.create_embedding("When is trash pickup?")
+    ids = {uuid7() for _ in range(3)}
+    second = await tool.create_embedding("When is trash pickup?")
+    ids |= {uuid7() for _ in range(3)}
+
+    # Assert
+    assert first == second
+    assert len(ids) == 6
+
+
+@pytest.mark.asyncio
+async def test_http_client_is_shared_and_recreated_after_close() -> None:
+    """Test that tools share one pooled HTTP client across calls."""
+    from app.tools.http_client import close_http_client, get_http_client
+    from app.tools.openai_tool import DemoOpenAITool
+
+    # Arrange
+    first = get_http_client()
+
+    # Act
+    tool = DemoOpenAITool()
+    await close_http_client()
+    second = get_http_client()
+
+    # Assert
+    assert first.is_closed
+    assert tool.http_client is second
+    await close_http_client()
+
+
+@pytest.mark.asyncio
+async def test_search_tool_uses_shared_credential() -> None:
+    """Test that the Search client is built with the shared Azure credential."""
+    from app.tools.credential import close_credential, get_credential
+
+    # Arrange
+    mock_credential = MagicMock()
+    mock_credential.close = AsyncMock()
+
+    with (
+        patch("azure.identity.aio.DefaultAzureCredential", return_value=mock_credential),
+        patch("azure.search.documents.aio.SearchClient") as mock_search_client,
+    ):
+        from app.tools.search_tool import SearchTool
+
+        # Act
+        client = SearchTool().client
+        shared = get_credential()
+        await close_credential()
+
+        # Assert
+        assert client is mock_search_client.return_value
+        assert mock_search_client.call_args.kwargs["credential"] is shared
+        mock_credential.close.assert_awaited_once()
+
+
+# Indexer Tests
+
+
+def test_indexer_reuses_stored_embeddings() -> None:
+    """Test that index setup embeds each text once and reads it back from the store."""
+    import numpy as np
+
+    from app.cache import EmbeddingStore
+    from data.indexer import setup_index
+
+    # Arrange
+    store = EmbeddingStore(":memory:")
+    texts = ["Trash Collection\n\nMonday pickup.", "Building Permits\n\nApply at City Hall."]
+    vectors = [np.array([0.5, 0.25], dtype=np.float32), np.array([0.125, 1.0], dtype=np.float32)]
+    embed = AsyncMock(return_value=vectors)
+
+    with patch.object(setup_index, "embed_texts", embed):
+        # Act
+        first = setup_index.get_or_compute_embeddings(texts, MagicMock(), store)
+        store._memory.clear()  # Force the read back from SQLite
+        second = setup_index.get_or_compute_embeddings(texts, MagicMock(), store)
+
+    # Assert
+    embed.assert_awaited_once()
+    for text, vector in zip(texts, vectors):
+        np.testing.assert_array_equal(first[text], vector)
+        np.testing.assert_array_equal(second[text], vector)